@@ -1,15 +1,18 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_pymongo import PyMongo
 from flask_wtf.csrf import CSRFProtect
+from pymongo.errors import PyMongoError
+from app.breaker import CircuitBreaker, GuardedPyMongo, HeartbeatListener, client_options
 from config import Config
 
 # ---- global extension objects (NO imports from app here) ----
 db = SQLAlchemy()
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
-mongo = PyMongo()
+# mongo.db fails fast while the breaker is open (see app/breaker.py)
+mongo_breaker = CircuitBreaker()
+mongo = GuardedPyMongo(breaker=mongo_breaker)
 csrf = CSRFProtect()
 
 
@@ -17,23 +20,84 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    from app import metrics, slowlog
+
     # init extensions
     db.init_app(app)
     login_manager.init_app(app)
-    mongo.init_app(app)
+    mongo_breaker.failure_threshold = app.config.get("MONGO_BREAKER_THRESHOLD", 3)
+    mongo_breaker.reset_timeout = app.config.get("MONGO_BREAKER_RESET", 30)
+    mongo_breaker.reset()
+    mongo.init_app(
+        app,
+        event_listeners=[metrics.mongo_listener, slowlog.listener, HeartbeatListener(mongo_breaker)],
+        **client_options(app.config),
+    )
     csrf.init_app(app)
 
+    # request timing for /metrics, slow query log for /slow-queries
+    metrics.init_metrics(app)
+    slowlog.listener.configure(
+        threshold_ms=app.config.get("SLOW_QUERY_MS", 100),
+        explain=app.config.get("SLOW_QUERY_EXPLAIN", True),
+    )
+
     # register blueprints
     from app.routes.main import main_bp
     from app.routes.auth import auth_bp
     from app.routes.patients import patients_bp
+    from app.routes.jobs import jobs_bp
 
     app.register_blueprint(main_bp)                     # "/" and "/dashboard"
     app.register_blueprint(auth_bp, url_prefix="/auth") # "/auth/..."
     app.register_blueprint(patients_bp, url_prefix="/patients")
+    app.register_blueprint(jobs_bp, url_prefix="/jobs")
+
+    # background jobs (imports, exports, rescoring) run on a local thread pool
+    from app.jobs import jobs
+    jobs.init_app(app)
+
+    # CLI commands ("flask rebuild-stats", ...)
+    from app.commands import register_commands
+    register_commands(app)
 
     with app.app_context():
         from app import models
         db.create_all()
+        metrics.instrument_engine(db.engine)
+
+    # a new app may mean a new user database: start with an empty cache
+    models.user_cache.maxsize = app.config.get("USER_CACHE_SIZE", 1024)
+    models.user_cache.ttl = app.config.get("USER_CACHE_TTL", 300)
+    models.user_cache.clear()
+
+    from app.patient_cache import patient_cache
+    patient_cache.maxsize = app.config.get("PATIENT_CACHE_SIZE", 2048)
+    patient_cache.ttl = app.config.get("PATIENT_CACHE_TTL", 60)
+    patient_cache.clear()
+
+    from app.analytics import histogram_cache
+    histogram_cache.maxsize = app.config.get("HISTOGRAM_CACHE_SIZE", 256)
+    histogram_cache.clear()
+
+    metrics.register_cache("users", models.user_cache)
+    metrics.register_cache("patients", patient_cache)
+    metrics.register_cache("histograms", histogram_cache)
+
+    if app.config.get("MONGO_WARMUP"):
+        # connect now (and open minPoolSize connections) instead of on the
+        # first request; if MongoDB is down, start with the circuit open
+        try:
+            mongo.cx.admin.command("ping")
+        except PyMongoError as e:
+            app.logger.warning("MongoDB is not reachable at start-up: %s", e)
+            mongo_breaker.trip()
+
+    if app.config.get("MONGO_ENSURE_INDEXES"):
+        from app.indexes import ensure_indexes
+        try:
+            ensure_indexes(mongo.db)
+        except PyMongoError as e:
+            app.logger.warning("Skipping MongoDB index creation: %s", e)
 
     return app
@@ -0,0 +1,318 @@
+"""
+In-process columnar snapshot of the 'patients' collection.
+
+Numeric fields are held as NumPy arrays and categorical fields are
+dictionary-encoded (an int32 code per patient plus a list of categories),
+so group-bys, histograms, percentiles and cross-tabs are vectorized
+in-memory operations instead of database round trips.
+
+The snapshot is loaded in bulk once and then refreshed incrementally: only
+documents whose ``updated_at`` is at or after the last watermark, less
+REFRESH_LAG, are fetched. ``updated_at`` is stamped by the app before the
+write, so a write can commit after the snapshot has seen a later stamp;
+the lag re-reads recent writes to pick those up (rows are replaced by
+_id, so a re-read is harmless). A row count that no longer matches the
+materialized statistics (i.e. a delete happened) triggers a full reload.
+
+``cohort_histogram`` bins a numeric field, optionally split by a flag or
+categorical field and restricted by the list filters (app/filters.py).
+Results are cached per (field, split, bins, filters) in an LRU cache
+keyed by the statistics version, which every patient write bumps; a new
+version also refreshes the snapshot and empties the cache.
+"""
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from app import mongo
+from app.cache import TTLCache
+from app.filters import CHOICE_FILTERS, FLAG_FILTERS, RANGE_FILTERS
+from app.stats import load_stats, stats_version
+
+# float64, NaN when missing
+NUMERIC_FIELDS = ("age", "avg_glucose_level", "bmi")
+# int8, -1 when missing
+FLAG_FIELDS = ("stroke", "hypertension", "heart_disease")
+# int32 codes into CohortSnapshot.categories[field], -1 when missing
+CATEGORICAL_FIELDS = ("gender", "work_type", "residence_type", "smoking_status")
+
+SNAPSHOT_PROJECTION = {
+    field: 1 for field in NUMERIC_FIELDS + FLAG_FIELDS + CATEGORICAL_FIELDS + ("updated_at",)
+}
+
+LOAD_BATCH_SIZE = 5000
+
+# how far behind the watermark an incremental refresh starts reading: longer
+# than any write (an import batch's bulk_write) takes between stamp and commit
+REFRESH_LAG = timedelta(seconds=120)
+
+
+def _number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+
+def _flag(value):
+    return value if value in (0, 1) else -1
+
+
+class CohortSnapshot:
+    """Immutable column store; refreshing builds a new snapshot."""
+
+    def __init__(self, ids, columns, categories, watermark=None):
+        self.ids = ids                    # list of _id, row order
+        self.columns = columns            # field -> np.ndarray
+        self.categories = categories      # field -> list of category values
+        self.watermark = watermark        # newest updated_at seen
+        self.row_of = {oid: i for i, oid in enumerate(ids)}
+
+    @property
+    def size(self):
+        return len(self.ids)
+
+    # ---------- building ----------
+
+    @classmethod
+    def empty(cls):
+        columns = {f: np.empty(0, dtype=np.float64) for f in NUMERIC_FIELDS}
+        columns.update({f: np.empty(0, dtype=np.int8) for f in FLAG_FIELDS})
+        columns.update({f: np.empty(0, dtype=np.int32) for f in CATEGORICAL_FIELDS})
+        return cls([], columns, {f: [] for f in CATEGORICAL_FIELDS})
+
+    @classmethod
+    def from_documents(cls, docs):
+        return cls.empty().merged(docs)
+
+    def merged(self, docs):
+        """New snapshot with docs inserted or, for known _ids, replaced."""
+        categories = {f: list(v) for f, v in self.categories.items()}
+        codes = {f: {c: i for i, c in enumerate(v)} for f, v in categories.items()}
+
+        def encode(field, value):
+            if value is None:
+                return -1
+            lookup = codes[field]
+            if value not in lookup:
+                lookup[value] = len(categories[field])
+                categories[field].append(value)
+            return lookup[value]
+
+        ids = list(self.ids)
+        row_of = dict(self.row_of)
+        updates = {f: ([], []) for f in self.columns}  # field -> (rows, values)
+        appended = {f: [] for f in self.columns}
+        watermark = self.watermark
+
+        for doc in docs:
+            values = {f: _number(doc.get(f)) for f in NUMERIC_FIELDS}
+            values.update({f: _flag(doc.get(f)) for f in FLAG_FIELDS})
+            values.update({f: encode(f, doc.get(f)) for f in CATEGORICAL_FIELDS})
+
+            row = row_of.get(doc["_id"])
+            if row is None:
+                row_of[doc["_id"]] = len(ids)
+                ids.append(doc["_id"])
+                for f, v in values.items():
+                    appended[f].append(v)
+            else:
+                for f, v in values.items():
+                    updates[f][0].append(row)
+                    updates[f][1].append(v)
+
+            stamp = doc.get("updated_at")
+            if stamp is not None and (watermark is None or stamp > watermark):
+                watermark = stamp
+
+        columns = {}
+        for f, col in self.columns.items():
+            new = np.concatenate([col, np.asarray(appended[f], dtype=col.dtype)])
+            rows, vals = updates[f]
+            if rows:
+                new[rows] = vals
+            columns[f] = new
+        return CohortSnapshot(ids, columns, categories, watermark)
+
+    # ---------- queries ----------
+
+    def _valid(self, field):
+        col = self.columns[field]
+        return ~np.isnan(col) if col.dtype.kind == "f" else col >= 0
+
+    def percentiles(self, field, qs=(25, 50, 75, 90, 99)):
+        """{"p50": value, ...} over the non-missing values of a numeric field."""
+        col = self.columns[field]
+        values = col[self._valid(field)]
+        keys = [f"p{q}" for q in qs]
+        if not values.size:
+            return dict.fromkeys(keys)
+        return dict(zip(keys, np.percentile(values, qs).round(2).tolist()))
+
+    def mask(self, filters):
+        """Boolean row mask for parse_filters output (same rules as build_filter_query)."""
+        keep = np.ones(self.size, dtype=bool)
+        for name, field in RANGE_FILTERS.items():
+            col = self.columns[field]
+            # NaN compares False, so a missing value fails any bound, as in MongoDB
+            if f"{name}_min" in filters:
+                keep &= col >= filters[f"{name}_min"]
+            if f"{name}_max" in filters:
+                keep &= col <= filters[f"{name}_max"]
+        for field in FLAG_FILTERS:
+            if field in filters:
+                keep &= self.columns[field] == filters[field]
+        for field in CHOICE_FILTERS:
+            if field in filters:
+                categories = self.categories[field]
+                codes = [categories.index(v) for v in filters[field] if v in categories]
+                keep &= np.isin(self.columns[field], codes)
+        return keep
+
+    def split_histogram(self, field, split=None, bins=20, mask=None):
+        """
+        Histogram of a numeric field with one series per value of split
+        (a flag or categorical field), all on the same bin edges.
+        """
+        keep = self._valid(field) if mask is None else self._valid(field) & mask
+        values = self.columns[field][keep]
+        result = {"field": field, "split": split, "bins": bins, "patients": int(values.size)}
+        if not values.size:
+            return {**result, "edges": [], "series": []}
+
+        edges = np.histogram_bin_edges(values, bins=bins)
+        # bin index per value; the last bin includes its right edge, as in np.histogram
+        index = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+        if split is None:
+            labels, groups = ["all"], np.zeros(values.size, dtype=np.int64)
+        else:
+            # shift codes by one so missing (-1) gets group 0
+            groups = self.columns[split][keep].astype(np.int64) + 1
+            labels = [None] + (self.categories[split] if split in CATEGORICAL_FIELDS else [0, 1])
+        counts = np.bincount(groups * bins + index, minlength=len(labels) * bins).reshape(len(labels), bins)
+        series = [
+            {"value": label, "counts": row.tolist(), "total": int(row.sum())}
+            for label, row in zip(labels, counts)
+            if row.any()
+        ]
+        return {**result, "edges": edges.round(2).tolist(), "series": series}
+
+    def group_by(self, by, field, agg="mean"):
+        """{category: agg(field)} for a categorical field, e.g. mean bmi by gender."""
+        codes = self.columns[by]
+        values = self.columns[field].astype(np.float64)
+        keep = (codes >= 0) & self._valid(field)
+        n_cat = len(self.categories[by])
+        counts = np.bincount(codes[keep], minlength=n_cat)
+        if agg == "count":
+            result = counts.astype(np.float64)
+        elif agg in ("sum", "mean"):
+            result = np.bincount(codes[keep], weights=values[keep], minlength=n_cat)
+            if agg == "mean":
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    result = result / counts
+        else:
+            raise ValueError(f"unsupported aggregate: {agg}")
+        return {
+            cat: (None if np.isnan(v) else round(float(v), 2))
+            for cat, v in zip(self.categories[by], result)
+        }
+
+    def stroke_rates(self, by):
+        """Cross-tab of a categorical field against stroke: {category: {...}}."""
+        codes = self.columns[by]
+        stroke = self.columns["stroke"]
+        keep = (codes >= 0) & (stroke >= 0)
+        n_cat = len(self.categories[by])
+        totals = np.bincount(codes[keep], minlength=n_cat)
+        strokes = np.bincount(codes[keep], weights=stroke[keep], minlength=n_cat)
+        return {
+            cat: {
+                "patients": int(n),
+                "strokes": int(s),
+                "rate": round(float(s) / n * 100, 2) if n else 0.0,
+            }
+            for cat, n, s in zip(self.categories[by], totals, strokes)
+        }
+
+
+# ---------- shared snapshot ----------
+
+_lock = threading.Lock()
+_snapshot = None
+_refreshed_at = 0.0
+_version = None
+
+
+def load_snapshot(coll):
+    """Full bulk load of coll."""
+    cursor = coll.find({}, SNAPSHOT_PROJECTION, batch_size=LOAD_BATCH_SIZE)
+    return CohortSnapshot.from_documents(cursor)
+
+
+def refresh_snapshot(snapshot, coll, expected_size=None, lag=REFRESH_LAG):
+    """
+    Apply documents modified since snapshot.watermark - lag. Falls back to
+    a full load when there is no watermark yet, or when expected_size
+    shows that documents were deleted.
+    """
+    if snapshot is None or snapshot.watermark is None:
+        return load_snapshot(coll)
+    changed = coll.find(
+        {"updated_at": {"$gte": snapshot.watermark - lag}},
+        SNAPSHOT_PROJECTION,
+        batch_size=LOAD_BATCH_SIZE,
+    )
+    snapshot = snapshot.merged(changed)
+    if expected_size is not None and snapshot.size != expected_size:
+        return load_snapshot(coll)
+    return snapshot
+
+
+def get_snapshot(max_age=30.0, version=None):
+    """
+    The shared snapshot, refreshed if it is older than max_age seconds or
+    was built before statistics version (app.stats.stats_version).
+    """
+    global _snapshot, _refreshed_at, _version
+    with _lock:
+        stale = version is not None and version != _version
+        if _snapshot is None or stale or time.monotonic() - _refreshed_at >= max_age:
+            coll = mongo.db.patients
+            _snapshot = refresh_snapshot(_snapshot, coll, expected_size=load_stats()["total"])
+            _refreshed_at = time.monotonic()
+            _version = version
+        return _snapshot
+
+
+# ---------- cached histograms ----------
+
+# create_app sizes and clears it
+histogram_cache = TTLCache(maxsize=256, ttl=600)
+_cached_version = None
+
+
+def _filter_key(filters):
+    return tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in (filters or {}).items()))
+
+
+def cohort_histogram(field, split=None, bins=20, filters=None, max_age=30.0):
+    """
+    split_histogram over the shared snapshot, restricted by filters
+    (parse_filters output). Cached until the next patient write.
+    """
+    global _cached_version
+    version = stats_version()
+    if version != _cached_version:
+        # a write happened: nothing cached under the old version is valid
+        histogram_cache.clear()
+        _cached_version = version
+    key = (field, split, bins, _filter_key(filters), version)
+    result = histogram_cache.get(key) if version is not None else None
+    if result is None:
+        snapshot = get_snapshot(max_age, version)
+        result = snapshot.split_histogram(field, split, bins, snapshot.mask(filters) if filters else None)
+        if version is not None:
+            histogram_cache.set(key, result)
+    return result
@@ -0,0 +1,129 @@
+"""
+Circuit breaker around the MongoDB client.
+
+pymongo already probes the server in the background: its monitor thread
+sends a heartbeat every heartbeatFrequencyMS. ``HeartbeatListener`` feeds
+those results into a ``CircuitBreaker``. After ``failure_threshold``
+consecutive failed heartbeats the circuit opens, and ``mongo.db`` raises
+``CircuitOpenError`` straight away instead of waiting out server selection
+on every request. The first successful heartbeat closes it again.
+
+CircuitOpenError is a ServerSelectionTimeoutError, so the routes' existing
+degraded-mode handlers (dummy data, "MongoDB is not available") apply
+unchanged.
+"""
+import logging
+import threading
+import time
+
+from flask_pymongo import PyMongo
+from pymongo import monitoring
+from pymongo.errors import ServerSelectionTimeoutError
+
+log = logging.getLogger(__name__)
+
+
+class CircuitOpenError(ServerSelectionTimeoutError):
+    """MongoDB was recently unreachable; the call was not attempted."""
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and closes on the
+    next success. While open, one caller every reset_timeout seconds is
+    let through as a trial, in case no heartbeats are arriving.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        """True if a call may go to MongoDB now."""
+        if self._opened_at is None:
+            return True
+        with self._lock:
+            now = self._clock()
+            if self._opened_at is not None and now - self._opened_at >= self.reset_timeout:
+                self._opened_at = now  # the next trial is one interval away
+                return True
+            return self._opened_at is None
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                log.info("MongoDB is reachable again; closing the circuit")
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is None and self._failures >= self.failure_threshold:
+                log.warning("MongoDB unreachable %d times in a row; opening the circuit", self._failures)
+                self._opened_at = self._clock()
+
+    def trip(self):
+        """Open immediately (e.g. the start-up ping failed)."""
+        with self._lock:
+            self._failures = max(self._failures, self.failure_threshold)
+            if self._opened_at is None:
+                self._opened_at = self._clock()
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+
+class HeartbeatListener(monitoring.ServerHeartbeatListener):
+    """Feeds pymongo's background server heartbeats into a breaker."""
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.breaker.record_success()
+
+    def failed(self, event):
+        self.breaker.record_failure()
+
+
+class GuardedPyMongo(PyMongo):
+    """PyMongo whose ``db`` raises CircuitOpenError while the breaker is open."""
+
+    def __init__(self, *args, breaker=None, **kwargs):
+        self.breaker = breaker
+        super().__init__(*args, **kwargs)
+
+    @property
+    def db(self):
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError("MongoDB is unavailable (circuit open)")
+        return self._db
+
+    @db.setter
+    def db(self, value):
+        self._db = value
+
+
+def client_options(config):
+    """MongoClient keyword arguments from the MONGO_* settings."""
+    return {
+        "serverSelectionTimeoutMS": config.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 2000),
+        "connectTimeoutMS": config.get("MONGO_CONNECT_TIMEOUT_MS", 2000),
+        "heartbeatFrequencyMS": config.get("MONGO_HEARTBEAT_MS", 2000),
+        "maxPoolSize": config.get("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": config.get("MONGO_MIN_POOL_SIZE", 0),
+    }
@@ -0,0 +1,157 @@
+"""
+Batch create / update / delete of patients (POST /patients/bulk).
+
+The request body is a JSON array (or {"operations": [...]}) of::
+
+    {"op": "create", "data": {...all PatientForm fields...}}
+    {"op": "update", "patient_id": 123, "data": {...fields to change...}}
+    {"op": "delete", "patient_id": 123}
+
+Every operation is validated against the patient rules in app/codec.py
+first (an update is validated as the stored patient with its changes
+applied). The valid ones go to MongoDB in one unordered bulk_write, so
+one bad item does not stop the rest, and each item gets its own result.
+"""
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.codec import FIELD_NAMES, Patient, PatientError
+from app.derived import add_derived_fields_batch
+
+OPERATIONS = ("create", "update", "delete")
+
+
+class BulkRequestError(ValueError):
+    """The request body is not a list of operations."""
+
+
+def parse_operations(payload, limit):
+    """The list of operations in a decoded JSON body."""
+    if isinstance(payload, dict):
+        payload = payload.get("operations")
+    if not isinstance(payload, list):
+        raise BulkRequestError("expected a JSON array of operations")
+    if len(payload) > limit:
+        raise BulkRequestError(f"at most {limit} operations per request")
+    return payload
+
+
+def validate_patient(data):
+    """(document, None) if data passes the patient rules, else (None, errors)."""
+    try:
+        return Patient.from_dict(data).to_document(), None
+    except PatientError as e:
+        return None, e.errors
+
+
+def _result(index, item, status, **extra):
+    patient_id = item.get("patient_id") if isinstance(item, dict) else None
+    if patient_id is None and isinstance(item, dict) and isinstance(item.get("data"), dict):
+        patient_id = item["data"].get("patient_id")
+    return {"index": index, "op": item.get("op") if isinstance(item, dict) else None,
+            "patient_id": patient_id, "status": status, **extra}
+
+
+def _key(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def run_bulk(coll, operations):
+    """
+    Validate and apply operations. Returns (results, removed, added,
+    touched): per-item results in request order, the stored documents that
+    were replaced or deleted and the documents that replaced them (for
+    app.stats.apply_delta), and the _ids of changed existing documents.
+    """
+    results = [None] * len(operations)
+
+    # one read for every patient an update or delete refers to
+    wanted = {
+        _key(item.get("patient_id"))
+        for item in operations
+        if isinstance(item, dict) and item.get("op") in ("update", "delete")
+    }
+    wanted.discard(None)
+    existing = {d["patient_id"]: d for d in coll.find({"patient_id": {"$in": sorted(wanted)}})} if wanted else {}
+
+    planned = []  # (item index, kind, write op, before, after)
+    seen = set()
+    for index, item in enumerate(operations):
+        if not isinstance(item, dict) or item.get("op") not in OPERATIONS:
+            results[index] = _result(index, item if isinstance(item, dict) else {}, "invalid",
+                                     errors={"op": [f"must be one of {', '.join(OPERATIONS)}"]})
+            continue
+        op = item["op"]
+        data = item.get("data") or {}
+        if not isinstance(data, dict):
+            results[index] = _result(index, item, "invalid", errors={"data": ["must be an object"]})
+            continue
+
+        key = _key(data.get("patient_id") if op == "create" else item.get("patient_id"))
+        if key is None:
+            results[index] = _result(index, item, "invalid", errors={"patient_id": ["is required"]})
+            continue
+        if key in seen:
+            results[index] = _result(index, item, "invalid",
+                                     errors={"patient_id": ["appears more than once in this request"]})
+            continue
+        seen.add(key)
+
+        if op == "create":
+            doc, errors = validate_patient(data)
+            if errors:
+                results[index] = _result(index, item, "invalid", errors=errors)
+                continue
+            planned.append((index, "created", None, None, doc))
+            continue
+
+        before = existing.get(key)
+        if before is None:
+            results[index] = _result(index, item, "not_found")
+            continue
+        if op == "delete":
+            planned.append((index, "deleted", DeleteOne({"_id": before["_id"]}), before, None))
+            continue
+
+        merged = {field: before.get(field) for field in FIELD_NAMES}
+        merged.update(data)
+        doc, errors = validate_patient(merged)
+        if errors:
+            results[index] = _result(index, item, "invalid", errors=errors)
+            continue
+        planned.append((index, "updated", None, before, doc))
+
+    # derived fields (search tokens, risk score, updated_at) in one pass
+    add_derived_fields_batch([after for _, _, _, _, after in planned if after is not None])
+    ops = []
+    for index, status, write, before, after in planned:
+        if status == "created":
+            write = InsertOne(after)
+        elif status == "updated":
+            write = UpdateOne({"_id": before["_id"]}, {"$set": after})
+        ops.append(write)
+
+    failed = {}
+    if ops:
+        try:
+            coll.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            for err in (e.details or {}).get("writeErrors", []):
+                failed[err["index"]] = err.get("errmsg", "write error")
+
+    removed, added, touched = [], [], []
+    for position, (index, status, _, before, after) in enumerate(planned):
+        item = operations[index]
+        if position in failed:
+            results[index] = _result(index, item, "error", error=failed[position])
+            continue
+        results[index] = _result(index, item, status)
+        if before is not None:
+            removed.append(before)
+            touched.append(before["_id"])
+        if after is not None:
+            added.append({**before, **after} if before is not None else after)
+    return results, removed, added, touched
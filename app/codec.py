@@ -0,0 +1,270 @@
+"""
+The Patient record and its codecs.
+
+FIELDS is the one description of the twelve stored patient fields: the
+document name, the CSV column of the stroke dataset, the type and the
+rules PatientForm enforces. Everything that reads or writes a patient
+(create/edit forms, the bulk endpoint, the CSV import and the export)
+converts through this module, so every write path coerces and validates
+the same way.
+
+``decode`` runs a table of per-field converters, built once from FIELDS
+at import time. The export helpers write stored documents out as CSV
+values or JSON without building Patient objects; the CSV import applies
+the same FIELDS rules a column at a time in app.ingest.
+"""
+import json
+import math
+from collections import namedtuple
+from operator import itemgetter
+
+Field = namedtuple("Field", "name column type required choices min max max_length")
+
+
+def _field(name, column, type, required=True, choices=None, min=None, max=None, max_length=None):
+    return Field(name, column, type, required, choices, min, max, max_length)
+
+
+FIELDS = (
+    _field("patient_id", "id", int),
+    _field("gender", "gender", str, choices=("Male", "Female", "Other")),
+    _field("age", "age", float, min=0, max=130),
+    _field("hypertension", "hypertension", int, choices=(0, 1)),
+    _field("heart_disease", "heart_disease", int, choices=(0, 1)),
+    _field("ever_married", "ever_married", str, choices=("Yes", "No")),
+    _field("work_type", "work_type", str, max_length=50),
+    _field("residence_type", "Residence_type", str, choices=("Urban", "Rural")),
+    _field("avg_glucose_level", "avg_glucose_level", float, min=0),
+    _field("bmi", "bmi", float, required=False),
+    _field("smoking_status", "smoking_status", str, required=False, max_length=50),
+    _field("stroke", "stroke", int, choices=(0, 1)),
+)
+
+FIELD_NAMES = tuple(f.name for f in FIELDS)
+CSV_HEADER = tuple(f.column for f in FIELDS)
+
+# written to CSV for a missing value (the dataset's own spelling)
+CSV_MISSING = "N/A"
+_BLANK = ("", CSV_MISSING)
+
+
+class PatientError(ValueError):
+    """Values that do not fit the patient schema; errors maps field -> [messages]."""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(f"{k}: {' '.join(v)}" for k, v in errors.items()))
+        self.errors = errors
+
+
+# ---------- per-field converters ----------
+
+# the range of a BSON int64, the widest integer MongoDB stores
+INT64_MIN, INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+# from here on, not every integer has an exact float
+_FLOAT_EXACT_LIMIT = 2 ** 53
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        raise ValueError("Not a valid integer value.")
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            value = float(value)
+    if not isinstance(value, int):
+        number = float(value)
+        # 1.0 and "1.0" are integers, as long as the float is exact
+        if not number.is_integer() or abs(number) >= _FLOAT_EXACT_LIMIT:
+            raise ValueError("Not a valid integer value.")
+        value = int(number)
+    if not INT64_MIN <= value <= INT64_MAX:
+        raise ValueError("Not a valid integer value.")
+    return value
+
+
+def _to_float(value):
+    number = float(value)
+    if math.isnan(number) or math.isinf(number):
+        raise ValueError("Not a valid float value.")
+    return number
+
+
+def _to_str(value):
+    return str(value).strip()
+
+
+# per-type converters, shared with app.ingest for the values it parses one by one
+CONVERTERS = {int: _to_int, float: _to_float, str: _to_str}
+# error messages, worded as PatientForm's validators word them
+TYPE_MESSAGES = {int: "Not a valid integer value.", float: "Not a valid float value.", str: "Not a valid string."}
+REQUIRED_MESSAGE = "This field is required."
+CHOICE_MESSAGE = "Not a valid choice."
+
+
+def range_message(field):
+    if field.max is None:
+        return f"Number must be at least {field.min}."
+    return f"Number must be between {field.min} and {field.max}."
+
+
+def length_message(field):
+    return f"Field cannot be longer than {field.max_length} characters."
+
+
+def _empty(text):
+    return not text or text.isspace()
+
+
+def _blank(text):
+    return _empty(text) or text == CSV_MISSING
+
+
+def _rules(field):
+    """(predicate, message) pairs for a present, converted value of field."""
+    rules = []
+    if field.choices is not None:
+        choices = frozenset(field.choices)
+        rules.append((lambda v: v not in choices, CHOICE_MESSAGE))
+    if field.min is not None and field.max is not None:
+        rules.append((lambda v: not field.min <= v <= field.max, range_message(field)))
+    elif field.min is not None:
+        rules.append((lambda v: v < field.min, range_message(field)))
+    if field.max_length is not None:
+        rules.append((lambda v: len(v) > field.max_length, length_message(field)))
+    return rules
+
+
+def _field_decoder(field):
+    """decode_one(value) -> (value, messages) for one field."""
+    convert = CONVERTERS[field.type]
+    type_message = TYPE_MESSAGES[field.type]
+    missing = (REQUIRED_MESSAGE,) if field.required else ()
+    rules = _rules(field)
+    numeric = field.type is not str
+    # "N/A" only means missing where a value may be missing; a required
+    # string keeps it as typed, as PatientForm does
+    blank = _blank if not field.required else _empty
+
+    def decode_one(value):
+        if value is None:
+            return None, list(missing)
+        if value.__class__ is str:
+            if numeric:
+                # numbers may be padded; " N/A " counts as missing too
+                value = value.strip()
+                if value in _BLANK:
+                    return None, list(missing)
+            elif blank(value):
+                return None, list(missing)
+            else:
+                # a string field keeps its value as typed
+                return value, [message for failed, message in rules if failed(value)]
+        try:
+            value = convert(value)
+        except (TypeError, ValueError, OverflowError):
+            return None, [type_message]
+        return value, [message for failed, message in rules if failed(value)]
+
+    return decode_one
+
+
+# one converter per field, in FIELDS order, built once at import time
+_DECODERS = tuple(_field_decoder(field) for field in FIELDS)
+
+
+def decode(values):
+    """
+    Coerce and validate raw values in FIELDS order. Returns (values,
+    errors): the converted tuple and {field: [messages]} (empty if valid).
+    Blank strings count as missing, and so does "N/A" for a number or an
+    optional string.
+    """
+    converted, errors = [], {}
+    for field, decode_one, value in zip(FIELDS, _DECODERS, values):
+        value, messages = decode_one(value)
+        if messages:
+            errors[field.name] = messages
+        converted.append(value)
+    return tuple(converted), errors
+
+
+def make_document(*values):
+    """A document from values in FIELDS order; use as map(make_document, *columns)."""
+    return dict(zip(FIELD_NAMES, values))
+
+
+_row_values = itemgetter(*CSV_HEADER)
+
+
+# ---------- the record ----------
+
+class Patient:
+    """One patient's stored fields; attribute names are FIELD_NAMES."""
+
+    __slots__ = FIELD_NAMES
+
+    def __init__(self, values):
+        for name, value in zip(FIELD_NAMES, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def _checked(cls, values):
+        values, errors = decode(values)
+        if errors:
+            raise PatientError(errors)
+        return cls(values)
+
+    @classmethod
+    def from_row(cls, row):
+        """From a csv.DictReader row of the stroke dataset."""
+        return cls._checked(_row_values(row))
+
+    @classmethod
+    def from_dict(cls, data):
+        """From a dict keyed by field name (decoded JSON, a merged update)."""
+        return cls._checked(tuple(data.get(name) for name in FIELD_NAMES))
+
+    @classmethod
+    def from_form(cls, form):
+        """From a PatientForm (after validate_on_submit)."""
+        return cls._checked(tuple(getattr(form, name).data for name in FIELD_NAMES))
+
+    @classmethod
+    def from_document(cls, doc):
+        """From a stored document, as is: stored values are not re-validated."""
+        return cls(tuple(doc.get(name) for name in FIELD_NAMES))
+
+    def values(self):
+        return tuple(getattr(self, name) for name in FIELD_NAMES)
+
+    def to_document(self):
+        """The stored fields as a dict (derived fields are added by app.derived)."""
+        return make_document(*self.values())
+
+    def fill_form(self, form):
+        """Pre-populate a PatientForm, e.g. on the edit page."""
+        for name in FIELD_NAMES:
+            getattr(form, name).data = getattr(self, name)
+        return form
+
+    def __eq__(self, other):
+        return isinstance(other, Patient) and self.values() == other.values()
+
+    def __repr__(self):
+        return f"Patient(patient_id={self.patient_id!r})"
+
+
+# ---------- batch conversion ----------
+
+def rows_from_documents(docs):
+    """CSV value lists (CSV_HEADER order) for stored documents."""
+    for doc in docs:
+        yield [CSV_MISSING if v is None else v for v in (doc.get(name) for name in FIELD_NAMES)]
+
+
+def json_from_documents(docs):
+    """One compact JSON object (the stored fields) per document."""
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    for doc in docs:
+        yield dumps({name: doc.get(name) for name in FIELD_NAMES})
@@ -0,0 +1,65 @@
+"""Flask CLI commands (run with ``flask --app run <command>``)."""
+import click
+
+from app import mongo
+from app.derived import refresh_derived_fields
+from app.indexes import ensure_indexes, index_report
+from app.risk import rescore_collection
+from app.stats import rebuild_stats, stats_drift
+
+
+def register_commands(app):
+
+    @app.cli.command("rebuild-stats")
+    @click.option("--check", is_flag=True, help="Only report drift; do not rewrite the statistics.")
+    def rebuild_stats_command(check):
+        """Recompute the materialized dashboard statistics from scratch."""
+        drift = stats_drift()
+        if drift:
+            click.echo(f"{len(drift)} statistic(s) drifted (stored -> actual):")
+            for key, (stored, actual) in drift.items():
+                click.echo(f"  {key}: {stored} -> {actual}")
+        else:
+            click.echo("Dashboard statistics are up to date.")
+
+        if not check:
+            stats = rebuild_stats()
+            click.echo(f"Rebuilt dashboard statistics for {stats['total']} patients.")
+
+    @app.cli.command("refresh-derived")
+    def refresh_derived_command():
+        """Recompute stored derived fields (search tokens, risk, ...) for all patients."""
+        updated = refresh_derived_fields(mongo.db.patients)
+        # risk bands changed underneath the materialized statistics
+        stats = rebuild_stats()
+        click.echo(f"Updated derived fields on {updated} of {stats['total']} patients.")
+
+    @app.cli.command("rescore-risk")
+    @click.option("--batch-size", default=5000, show_default=True)
+    def rescore_risk_command(batch_size):
+        """Re-score stroke risk for every patient in vectorized batches."""
+        updated = rescore_collection(mongo.db.patients, batch_size=batch_size)
+        stats = rebuild_stats()
+        click.echo(f"Updated risk scores on {updated} of {stats['total']} patients.")
+
+    @app.cli.command("ensure-indexes")
+    def ensure_indexes_command():
+        """Create the MongoDB indexes listed in app/indexes.py."""
+        failures = ensure_indexes(mongo.db)
+        for coll_name, name, error in failures:
+            click.echo(f"FAILED {coll_name}.{name}: {error}")
+        if not failures:
+            click.echo("All registered indexes are present.")
+
+    @app.cli.command("index-report")
+    def index_report_command():
+        """Report missing/unused indexes and collection scans."""
+        report = index_report(mongo.db)
+        click.echo(f"Missing indexes: {', '.join(report['missing']) or 'none'}")
+        click.echo(f"Unused indexes:  {', '.join(report['unused']) or 'none'}")
+        for plan in report["plans"]:
+            flag = "COLLSCAN" if plan["collscan"] else ("covered" if plan["covered"] else "ok")
+            click.echo(
+                f"  [{flag:8}] {plan['name']}: {' <- '.join(plan['stages'])} "
+                f"(examined {plan['docs_examined']}, returned {plan['returned']})"
+            )
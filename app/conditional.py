@@ -0,0 +1,57 @@
+"""
+Conditional GET support (ETag / 304 Not Modified) for read-only pages.
+
+A view computes a cheap validator, such as the statistics ``version`` that
+every patient write bumps or a patient's ``updated_at``. ``page_etag`` mixes
+in everything else the rendered page depends on: the user, their role and
+the full query string. If the browser sends back the same ETag,
+``not_modified`` returns a 304 before any query runs or any template is
+rendered.
+
+Responses are marked ``Cache-Control: private, no-cache`` and ``Vary:
+Cookie``. Shared caches must not store them, and browsers must revalidate
+on every use.
+"""
+import hashlib
+import time
+
+from flask import current_app, request, session
+from flask_login import current_user
+
+
+def page_etag(validator, *parts):
+    """ETag for the current user's view of the current URL, or None."""
+    if validator is None:
+        return None
+    key = [
+        validator,
+        current_user.get_id(),
+        getattr(current_user, "role", None),
+        request.full_path,
+        *parts,
+    ]
+    if current_app.config.get("WTF_CSRF_ENABLED", True):
+        # pages embed CSRF tokens that expire: re-render well before they do
+        limit = current_app.config.get("WTF_CSRF_TIME_LIMIT") or 3600
+        key.append(int(time.time() // max(limit // 2, 1)))
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def not_modified(etag):
+    """A 304 response if the browser already has etag, otherwise None."""
+    if etag is None or session.get("_flashes"):
+        # pending flash messages must be rendered into a fresh page
+        return None
+    if request.if_none_match.contains_weak(etag):
+        return cacheable(current_app.response_class(status=304), etag)
+    return None
+
+
+def cacheable(response, etag):
+    """Attach the ETag and private revalidation headers to response."""
+    if etag is None:
+        return response
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Cookie")
+    return response
@@ -0,0 +1,60 @@
+"""
+Fields computed at write time and stored on the patient document, so
+reads can be served by an index instead of recomputing:
+
+- search_tokens: words for the free-text search (app/search.py)
+- updated_at: modification watermark for incremental readers
+  (app/analytics.py)
+- risk_score / risk_band: predicted stroke risk (app/risk.py)
+"""
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from app.risk import score_documents
+from app.search import search_tokens
+
+
+def add_derived_fields_batch(docs):
+    """Set the derived fields on every doc in place; risk is scored in one pass."""
+    now = datetime.now(timezone.utc)
+    for doc, risk in zip(docs, score_documents(docs)):
+        doc["search_tokens"] = search_tokens(doc)
+        doc["updated_at"] = now
+        doc.update(risk)
+    return docs
+
+
+def add_derived_fields(doc):
+    """Set the derived fields on doc in place and return it."""
+    add_derived_fields_batch([doc])
+    return doc
+
+
+def refresh_derived_fields(coll, batch_size=1000):
+    """
+    Recompute the derived fields of every document in coll (e.g. after
+    adding a new one). Returns the number of documents updated.
+    """
+    updated = 0
+    batch = []
+
+    def flush():
+        # the whole batch is scored by one vectorized pass (app.risk)
+        derived = add_derived_fields_batch([dict(doc) for doc in batch])
+        ops = []
+        for doc, new in zip(batch, derived):
+            changes = {k: v for k, v in new.items() if k != "updated_at" and doc.get(k) != v}
+            if changes:
+                changes["updated_at"] = new["updated_at"]
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+        batch.clear()
+        return coll.bulk_write(ops, ordered=False).modified_count if ops else 0
+
+    for doc in coll.find({}, batch_size=batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            updated += flush()
+    if batch:
+        updated += flush()
+    return updated
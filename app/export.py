@@ -0,0 +1,68 @@
+"""
+Streaming encoders for the patients export.
+
+Each encoder takes an iterator of patient documents and yields encoded
+chunks, so a response can be streamed straight from a MongoDB cursor
+with constant memory.
+"""
+import csv
+import io
+import zlib
+
+from app.codec import CSV_HEADER, FIELD_NAMES, json_from_documents, rows_from_documents
+
+# same header as the stroke dataset (app.codec), so an exported file can
+# be imported again
+EXPORT_PROJECTION = {"_id": 0, **{field: 1 for field in FIELD_NAMES}}
+
+# coalesce rows into chunks of roughly this many bytes
+CHUNK_SIZE = 64 * 1024
+
+
+def _chunked(pieces, size=CHUNK_SIZE):
+    buf, length = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buf)
+            buf, length = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def ndjson_chunks(docs):
+    """One JSON object per line."""
+    return _chunked(line + "\n" for line in json_from_documents(docs))
+
+
+def csv_chunks(docs):
+    """CSV with the dataset's header; a missing value is written as N/A."""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+
+    def take():
+        text = out.getvalue()
+        out.seek(0)
+        out.truncate()
+        return text
+
+    def rows():
+        # the header goes out even when no document matches
+        writer.writerow(CSV_HEADER)
+        yield take()
+        for row in rows_from_documents(docs):
+            writer.writerow(row)
+            yield take()
+
+    return _chunked(rows())
+
+
+def gzip_chunks(chunks, level=6):
+    """gzip-compress a stream of text chunks incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,142 @@
+"""
+Structured patient filters for the list page (and exports).
+
+Query-string parameters are parsed into a normalized filter dict and
+compiled into plain MongoDB predicates: ``$gte``/``$lte`` ranges and
+equality/``$in`` matches that the indexes in app/indexes.py can answer,
+never regexes. ``faceted_page`` then fetches one keyset page, the total
+and per-field facet counts of the matching patients in one aggregation.
+
+    ?age_min=40&age_max=65&glucose_min=150&smoking_status=smokes
+    &smoking_status=formerly+smoked&hypertension=1
+"""
+from app.pagination import page_cursors, seek_clause
+from app.search import build_search_query
+
+# filter name -> document field, for ?<name>_min= / ?<name>_max=
+RANGE_FILTERS = {
+    "age": "age",
+    "glucose": "avg_glucose_level",
+    "bmi": "bmi",
+}
+
+# 0/1 fields, ?<field>=0|1
+FLAG_FILTERS = ("hypertension", "heart_disease", "stroke")
+
+# string fields; the parameter may repeat to match any of several values
+CHOICE_FILTERS = ("work_type", "residence_type", "smoking_status")
+
+# values offered by the filter form (the values in the stroke dataset)
+CHOICE_OPTIONS = {
+    "work_type": ["Private", "Self-employed", "Govt_job", "children", "Never_worked"],
+    "residence_type": ["Urban", "Rural"],
+    "smoking_status": ["never smoked", "formerly smoked", "smokes", "Unknown"],
+}
+
+# fields counted for every filtered page
+FACET_FIELDS = ("smoking_status", "work_type", "residence_type", "hypertension", "heart_disease", "stroke")
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number == number else None  # drop NaN
+
+
+def parse_filters(args):
+    """
+    Normalized filters from request args; unparsable values are ignored.
+    Keys are the query-string parameter names, so the result can be
+    passed back to url_for.
+    """
+    filters = {}
+    for name in RANGE_FILTERS:
+        for bound in ("min", "max"):
+            value = _number(args.get(f"{name}_{bound}"))
+            if value is not None:
+                filters[f"{name}_{bound}"] = value
+    for field in FLAG_FILTERS:
+        if args.get(field) in ("0", "1"):
+            filters[field] = int(args[field])
+    for field in CHOICE_FILTERS:
+        values = sorted({v.strip() for v in args.getlist(field) if v.strip()})
+        if values:
+            filters[field] = values
+    return filters
+
+
+def build_filter_query(filters):
+    """MongoDB predicate for parse_filters output ({} when there are none)."""
+    query = {}
+    for name, field in RANGE_FILTERS.items():
+        bounds = {}
+        if f"{name}_min" in filters:
+            bounds["$gte"] = filters[f"{name}_min"]
+        if f"{name}_max" in filters:
+            bounds["$lte"] = filters[f"{name}_max"]
+        if bounds:
+            query[field] = bounds
+    for field in FLAG_FILTERS:
+        if field in filters:
+            query[field] = filters[field]
+    for field in CHOICE_FILTERS:
+        values = filters.get(field)
+        if values:
+            query[field] = values[0] if len(values) == 1 else {"$in": values}
+    return query
+
+
+def combine_queries(*queries):
+    """AND together the non-empty queries."""
+    queries = [q for q in queries if q]
+    if len(queries) <= 1:
+        return queries[0] if queries else {}
+    return {"$and": queries}
+
+
+def list_query(args):
+    """The query for ?q= plus the structured filters, as the list page runs it."""
+    q = args.get("q", "").strip()
+    return combine_queries(build_search_query(q) if q else {}, build_filter_query(parse_filters(args)))
+
+
+def facet_pipeline(query, per_page, after=None, before=None, projection=None):
+    """The aggregation behind faceted_page."""
+    seek, order, _ = seek_clause(after, before)
+    page = ([{"$match": seek}] if seek else []) + [
+        {"$sort": {"_id": order}},
+        # one extra row tells us whether another page exists
+        {"$limit": per_page + 1},
+    ]
+    if projection:
+        page.append({"$project": projection})
+    facets = {
+        "page": page,
+        "total": [{"$count": "n"}],
+    }
+    for field in FACET_FIELDS:
+        facets[f"facet_{field}"] = [
+            {"$group": {"_id": f"${field}", "n": {"$sum": 1}}},
+            {"$sort": {"n": -1, "_id": 1}},
+        ]
+    return [{"$match": query}, {"$facet": facets}]
+
+
+def faceted_page(coll, query, per_page, after=None, before=None, projection=None):
+    """
+    One keyset page of coll matching query, plus the total and the facet
+    counts, in a single aggregate round trip. Returns (docs, next_cursor,
+    prev_cursor, total, facets) where facets maps each FACET_FIELDS name
+    to a list of (value, count) pairs, most common first.
+    """
+    pipeline = facet_pipeline(query, per_page, after, before, projection)
+    result = next(iter(coll.aggregate(pipeline)), None) or {}
+    docs, next_cursor, prev_cursor = page_cursors(result.get("page", []), per_page, after, before)
+    total = result["total"][0]["n"] if result.get("total") else 0
+    facets = {
+        field: [(row["_id"], row["n"]) for row in result.get(f"facet_{field}", [])]
+        for field in FACET_FIELDS
+    }
+    return docs, next_cursor, prev_cursor, total, facets
@@ -1,3 +1,5 @@
+import math
+
 from flask_wtf import FlaskForm
 from wtforms import (
     StringField,
@@ -12,8 +14,11 @@ from wtforms.validators import (
     Length,
     NumberRange,
     Optional,
+    ValidationError,
 )
 
+from app.codec import INT64_MAX, INT64_MIN, TYPE_MESSAGES
+
 
 # ---------------- AUTH FORMS ---------------- #
 
@@ -45,11 +50,17 @@ class RegisterForm(FlaskForm):
 
 # ---------------- PATIENT FORM ---------------- #
 
+def finite(form, field):
+    """FloatField accepts "nan" and "inf"; the patient rules do not."""
+    if field.data is not None and not math.isfinite(field.data):
+        raise ValidationError(TYPE_MESSAGES[float])
+
+
 class PatientForm(FlaskForm):
 
     patient_id = IntegerField(
         "Patient ID",
-        validators=[DataRequired()],
+        validators=[DataRequired(), NumberRange(min=INT64_MIN, max=INT64_MAX)],
     )
 
     gender = SelectField(
@@ -60,7 +71,7 @@ class PatientForm(FlaskForm):
 
     age = FloatField(
         "Age",
-        validators=[DataRequired(), NumberRange(min=0, max=130)],
+        validators=[DataRequired(), finite, NumberRange(min=0, max=130)],
     )
 
     hypertension = SelectField(
@@ -96,12 +107,12 @@ class PatientForm(FlaskForm):
 
     avg_glucose_level = FloatField(
         "Average Glucose Level",
-        validators=[DataRequired(), NumberRange(min=0)],
+        validators=[DataRequired(), finite, NumberRange(min=0)],
     )
 
     bmi = FloatField(
         "BMI",
-        validators=[Optional()],
+        validators=[Optional(), finite],
     )
 
     smoking_status = StringField(
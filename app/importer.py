@@ -0,0 +1,219 @@
+"""
+Streaming, incremental CSV import for the MongoDB 'patients' collection.
+
+The file is read in blocks of ``batch_size`` rows and parsed a column at a
+time (app.ingest): NumPy coerces the numbers and the "N/A" sentinel of a
+whole block at once and checks the PatientForm rules as masks. Every valid
+row gets a ``content_hash`` of its normalized values. One $in query per
+block fetches the stored hashes for its patient_ids. Only new rows and rows whose hash
+differs are upserted by patient_id, in one unordered ``bulk_write``.
+Re-importing an unchanged file therefore costs one read per block and no
+writes. Edits made in the app do not change the stored hash, so they
+survive a re-import unless that patient's row in the file changed.
+
+With ``prune=True``, patients whose patient_id is not in the file are
+deleted afterwards. The collection is never emptied first.
+"""
+import hashlib
+import json
+
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.derived import add_derived_fields_batch
+from app.ingest import ingest_csv
+from app.stats import STATS_PROJECTION
+
+# Keep the per-batch error list short; the counts are always exact.
+MAX_ERRORS_PER_BATCH = 20
+
+# what a stored patient contributes to the diff and the statistics delta
+EXISTING_PROJECTION = {"patient_id": 1, "content_hash": 1, **STATS_PROJECTION}
+
+
+def content_hash(doc):
+    """Stable hash of a converted row (the stored fields app.ingest produces)."""
+    encoded = json.dumps(doc, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def convert_batch(parsed, seen):
+    """
+    Finish a ParsedBlock from app.ingest; seen is the set of patient_ids
+    met so far in the file and is updated.
+    Returns (docs, line_numbers, errors); errors is a list of
+    {"row": line_number, "error": message} for rows that failed coercion
+    or validation (with "fields": {field: [messages]}) or repeat an
+    earlier patient_id.
+    """
+    errors = list(parsed.rejects)
+    docs, lines = [], []
+    for doc, line in zip(parsed.docs, parsed.lines):
+        if doc["patient_id"] in seen:
+            errors.append({"row": line, "error": f"duplicate patient_id {doc['patient_id']}"})
+            continue
+        seen.add(doc["patient_id"])
+        doc["content_hash"] = content_hash(doc)
+        docs.append(doc)
+        lines.append(line)
+    errors.sort(key=lambda e: e["row"])
+    return docs, lines, errors
+
+
+def diff_batch(coll, docs, lines):
+    """
+    Compare docs with the stored patients in one query.
+    Returns ([(doc, line, stored_or_None), ...] to write, unchanged count).
+    """
+    if not docs:
+        return [], 0
+    ids = [doc["patient_id"] for doc in docs]
+    stored = {d["patient_id"]: d for d in coll.find({"patient_id": {"$in": ids}}, EXISTING_PROJECTION)}
+    changed, unchanged = [], 0
+    for doc, line in zip(docs, lines):
+        before = stored.get(doc["patient_id"])
+        if before is not None and before.get("content_hash") == doc["content_hash"]:
+            unchanged += 1
+        else:
+            changed.append((doc, line, before))
+    return changed, unchanged
+
+
+def upsert_batch(coll, changed):
+    """
+    Upsert the changed docs by patient_id with one unordered bulk_write.
+    Returns (written, errors): the (doc, line, stored) entries that were
+    written, and errors carrying CSV line numbers.
+    """
+    if not changed:
+        return [], []
+    add_derived_fields_batch([doc for doc, _, _ in changed])
+    ops = [
+        UpdateOne({"patient_id": doc["patient_id"]}, {"$set": doc}, upsert=True)
+        for doc, _, _ in changed
+    ]
+    try:
+        coll.bulk_write(ops, ordered=False)
+        return changed, []
+    except BulkWriteError as e:
+        write_errors = (e.details or {}).get("writeErrors", [])
+        failed = {err["index"] for err in write_errors}
+        errors = [
+            {"row": changed[err["index"]][1], "error": err.get("errmsg", "write error")}
+            for err in write_errors
+        ]
+        return [c for i, c in enumerate(changed) if i not in failed], errors
+
+
+def prune_missing(coll, seen, batch_size=1000, on_batch=None):
+    """
+    Delete every patient whose patient_id is not in seen, batch_size at a
+    time. on_batch(removed_docs, []) is called after every delete.
+    Returns the number deleted.
+    """
+    deleted = 0
+    missing = []
+
+    def flush():
+        result = coll.bulk_write([DeleteOne({"_id": d["_id"]}) for d in missing], ordered=False)
+        if on_batch is not None:
+            on_batch(list(missing), [])
+        missing.clear()
+        return result.deleted_count
+
+    for doc in coll.find({}, EXISTING_PROJECTION, batch_size=batch_size):
+        if doc.get("patient_id") not in seen:
+            missing.append(doc)
+            if len(missing) >= batch_size:
+                deleted += flush()
+    if missing:
+        deleted += flush()
+    return deleted
+
+
+def import_csv(coll, csv_path, batch_size=1000, on_batch=None, prune=False, on_progress=None):
+    """
+    Stream csv_path into coll in batches of batch_size rows, writing only
+    new and changed rows. If given, on_batch(removed_docs, added_docs) is
+    called after every write: the stored versions of replaced or deleted
+    patients and the new versions (as for app.stats.apply_delta).
+    on_progress(rows_read, summary), if given, is called after every batch;
+    an exception it raises stops the import after that batch. A file
+    without the dataset's columns raises app.ingest.CSVHeaderError.
+
+    Returns a summary dict::
+
+        {
+            "inserted": int,      # new patient_ids
+            "updated": int,       # rows whose content changed
+            "unchanged": int,
+            "deleted": int,       # pruned patients
+            "rejected": int,
+            "batches": int,
+            "pruned": bool,
+            "failed_batches": [
+                {"batch": n, "first_row": l, "last_row": l,
+                 "written": k, "rejected": r, "errors": [...]},
+            ],
+        }
+
+    Only batches with at least one rejected row are listed in
+    ``failed_batches``. Pruning is skipped when any row was rejected,
+    since a rejected row's patient would otherwise be deleted.
+    """
+    summary = {
+        "inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0,
+        "rejected": 0, "batches": 0, "pruned": False, "failed_batches": [],
+    }
+    seen = set()
+
+    for number, parsed in enumerate(ingest_csv(csv_path, batch_size), start=1):
+        docs, lines, errors = convert_batch(parsed, seen)
+        changed, unchanged = diff_batch(coll, docs, lines)
+        written, write_errors = upsert_batch(coll, changed)
+        errors.extend(write_errors)
+        if on_batch is not None and written:
+            on_batch(
+                [before for _, _, before in written if before is not None],
+                [{**before, **doc} if before else doc for doc, _, before in written],
+            )
+
+        summary["batches"] += 1
+        summary["unchanged"] += unchanged
+        for _, _, before in written:
+            summary["updated" if before is not None else "inserted"] += 1
+        rejected = parsed.size - unchanged - len(written)
+        summary["rejected"] += rejected
+
+        if rejected:
+            summary["failed_batches"].append({
+                "batch": number,
+                "first_row": parsed.first_line,
+                "last_row": parsed.last_line,
+                "written": len(written),
+                "rejected": rejected,
+                "errors": errors[:MAX_ERRORS_PER_BATCH],
+            })
+        if on_progress is not None:
+            on_progress(parsed.last_line - 1, summary)
+
+    if prune and not summary["rejected"]:
+        summary["deleted"] = prune_missing(coll, seen, batch_size, on_batch)
+        summary["pruned"] = True
+    return summary
+
+
+def describe_failures(summary, limit=3):
+    """Short human-readable description of the failed batches."""
+    parts = []
+    for b in summary["failed_batches"][:limit]:
+        first = b["errors"][0] if b["errors"] else None
+        detail = f" (row {first['row']}: {first['error']})" if first else ""
+        parts.append(
+            f"batch {b['batch']} rows {b['first_row']}-{b['last_row']}: "
+            f"{b['rejected']} rejected{detail}"
+        )
+    more = len(summary["failed_batches"]) - limit
+    if more > 0:
+        parts.append(f"and {more} more batch(es)")
+    return "; ".join(parts)
@@ -0,0 +1,214 @@
+"""
+Declarative MongoDB index management.
+
+REQUIRED_INDEXES lists every index the queries in app/routes/patients.py
+rely on. ``ensure_indexes`` creates them idempotently (at startup when
+MONGO_ENSURE_INDEXES is set, or with ``flask ensure-indexes``) and
+``index_report`` checks the live database against the registry using
+``$indexStats`` and ``explain()`` of the registered query shapes.
+"""
+import logging
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+log = logging.getLogger(__name__)
+
+# collection name -> indexes it must have
+REQUIRED_INDEXES = {
+    "patients": [
+        IndexModel([("patient_id", ASCENDING)], name="patient_id_unique", unique=True),
+        # covers the dashboard high-risk query (filter, sort and projection)
+        IndexModel(
+            [
+                ("stroke", ASCENDING),
+                ("avg_glucose_level", DESCENDING),
+                ("patient_id", ASCENDING),
+                ("age", ASCENDING),
+                ("bmi", ASCENDING),
+            ],
+            name="stroke_glucose_covering",
+        ),
+        IndexModel([("gender", ASCENDING)], name="gender"),
+        IndexModel([("age", ASCENDING)], name="age"),
+        IndexModel([("smoking_status", ASCENDING)], name="smoking_status"),
+        # range filters on the patient list (app/filters.py)
+        IndexModel([("avg_glucose_level", ASCENDING)], name="avg_glucose_level"),
+        IndexModel([("bmi", ASCENDING)], name="bmi"),
+        # top-K predicted stroke risk on the dashboard (app/risk.py)
+        IndexModel(
+            [("risk_score", DESCENDING), ("patient_id", ASCENDING), ("age", ASCENDING)],
+            name="risk_score_covering",
+        ),
+        # multikey index behind the free-text search (app/search.py)
+        IndexModel([("search_tokens", ASCENDING)], name="search_tokens"),
+        # incremental refresh of the analytics snapshot (app/analytics.py)
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+}
+
+# Indexes superseded by an entry above; ensure_indexes drops them.
+RETIRED_INDEXES = {
+    "patients": ["stroke_glucose"],
+}
+
+# Representative query shapes issued by the patient routes. Each one is
+# explained by index_report to catch collection scans.
+QUERY_SHAPES = [
+    {
+        "name": "patient lookup by patient_id",
+        "collection": "patients",
+        "filter": {"patient_id": 0},
+    },
+    {
+        "name": "stroke count",
+        "collection": "patients",
+        "filter": {"stroke": 1},
+    },
+    {
+        "name": "gender count",
+        "collection": "patients",
+        "filter": {"gender": "Male"},
+    },
+    {
+        "name": "age band count",
+        "collection": "patients",
+        "filter": {"age": {"$gt": 20, "$lte": 40}},
+    },
+    {
+        "name": "smoking status filter",
+        "collection": "patients",
+        "filter": {"smoking_status": "smokes"},
+    },
+    {
+        "name": "free-text search",
+        "collection": "patients",
+        "filter": {"search_tokens": {"$regex": "^smok"}},
+    },
+    {
+        "name": "high-risk list",
+        "collection": "patients",
+        "filter": {"stroke": 1},
+        "sort": [("avg_glucose_level", DESCENDING)],
+        "limit": 10,
+        "projection": {"_id": 0, "patient_id": 1, "age": 1, "avg_glucose_level": 1, "bmi": 1},
+    },
+    {
+        "name": "top predicted risk",
+        "collection": "patients",
+        "filter": {"risk_score": {"$gte": 0}},
+        "sort": [("risk_score", DESCENDING)],
+        "limit": 10,
+        "projection": {"_id": 0, "patient_id": 1, "age": 1, "risk_score": 1},
+    },
+    {
+        "name": "structured list filter",
+        "collection": "patients",
+        "filter": {"age": {"$gte": 40, "$lte": 65}, "avg_glucose_level": {"$gte": 150}, "hypertension": 1},
+    },
+    {
+        "name": "analytics snapshot refresh",
+        "collection": "patients",
+        "filter": {"updated_at": {"$gte": datetime(2000, 1, 1, tzinfo=timezone.utc)}},
+    },
+    {
+        "name": "patient list page",
+        "collection": "patients",
+        "filter": {},
+        "sort": [("_id", ASCENDING)],
+        "limit": 51,
+        "projection": {"patient_id": 1, "gender": 1, "age": 1, "stroke": 1},
+    },
+]
+
+
+def ensure_indexes(db):
+    """
+    Create every registered index and drop retired ones. Safe to run
+    repeatedly: existing indexes with the same spec are left alone.
+    Returns a list of (collection, index name, error message) failures.
+    """
+    failures = []
+    for coll_name, names in RETIRED_INDEXES.items():
+        existing = db[coll_name].index_information()
+        for name in names:
+            if name in existing:
+                db[coll_name].drop_index(name)
+    for coll_name, models in REQUIRED_INDEXES.items():
+        coll = db[coll_name]
+        for model in models:
+            name = model.document["name"]
+            try:
+                coll.create_indexes([model])
+            except OperationFailure as e:
+                # duplicate keys under a unique index, or a conflicting spec
+                failures.append((coll_name, name, str(e)))
+                log.warning("Could not create index %s.%s: %s", coll_name, name, e)
+    return failures
+
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain() plan tree."""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        yield from _plan_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+def explain_shape(db, shape):
+    """explain() one registered query shape; returns a short summary dict."""
+    cursor = db[shape["collection"]].find(shape["filter"], shape.get("projection"))
+    if shape.get("sort"):
+        cursor = cursor.sort(shape["sort"])
+    if shape.get("limit"):
+        cursor = cursor.limit(shape["limit"])
+    plan = cursor.explain()
+    winning = plan.get("queryPlanner", {}).get("winningPlan", {})
+    stages = list(_plan_stages(winning))
+    stats = plan.get("executionStats", {})
+    return {
+        "name": shape["name"],
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages,
+        # an index-only plan never fetches the documents
+        "covered": "FETCH" not in stages and "COLLSCAN" not in stages,
+        "in_memory_sort": "SORT" in stages,
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+    }
+
+
+def index_report(db):
+    """
+    Compare the live database with the registry.
+
+    Returns {"missing": [...], "unused": [...], "plans": [...]}:
+    registered indexes that do not exist, existing indexes with no
+    recorded accesses in $indexStats, and an explain summary per query
+    shape in QUERY_SHAPES.
+    """
+    report = {"missing": [], "unused": [], "plans": []}
+
+    for coll_name, models in REQUIRED_INDEXES.items():
+        coll = db[coll_name]
+        existing = coll.index_information()
+        for model in models:
+            name = model.document["name"]
+            if name not in existing:
+                report["missing"].append(f"{coll_name}.{name}")
+        try:
+            for stat in coll.aggregate([{"$indexStats": {}}]):
+                if stat["name"] != "_id_" and not stat.get("accesses", {}).get("ops"):
+                    report["unused"].append(f"{coll_name}.{stat['name']}")
+        except PyMongoError as e:
+            log.warning("$indexStats not available for %s: %s", coll_name, e)
+
+    for shape in QUERY_SHAPES:
+        report["plans"].append(explain_shape(db, shape))
+
+    return report
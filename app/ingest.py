@@ -0,0 +1,247 @@
+"""
+Columnar, vectorized parsing of the stroke dataset CSV.
+
+``read_blocks`` reads the file in blocks of rows and transposes each
+block into one NumPy array per column. ``parse_block`` then converts
+whole columns at once: a numeric column is one astype(int64) or
+astype(float64) with "N/A" and blanks as the missing sentinel, and the
+PatientForm rules in app.codec.FIELDS (required, ranges, choices,
+lengths) become boolean masks. Valid rows come out as ready-to-write
+documents, identical to what app.codec.Patient.from_row produces.
+Rejected rows come out in a report with their row numbers and per-field
+messages.
+
+Columns are object arrays of the parsed str values: the strings are
+never copied, and astype() converts them in one C loop. Integers are
+parsed as integers, never through a float, so large ids stay exact. Only
+a column that contains a value astype() rejects (a padded sentinel, "1.0"
+for an integer, something unparsable or out of the int64 range) falls
+back to app.codec's converter, value by value.
+"""
+import csv
+from collections import namedtuple
+from itertools import islice
+
+import numpy as np
+
+from app.codec import (
+    CHOICE_MESSAGE,
+    CSV_HEADER,
+    CSV_MISSING,
+    CONVERTERS,
+    FIELDS,
+    REQUIRED_MESSAGE,
+    TYPE_MESSAGES,
+    PatientError,
+    length_message,
+    make_document,
+    range_message,
+)
+
+# first_line / last_line are CSV row numbers (the header is row 1);
+# columns maps CSV_HEADER columns to arrays and "_line" to row numbers
+Block = namedtuple("Block", "first_line last_line size columns rejects")
+
+# docs and lines of the valid rows; rejects as {"row", "error", "fields"}
+ParsedBlock = namedtuple("ParsedBlock", "first_line last_line size docs lines rejects")
+
+
+class CSVHeaderError(ValueError):
+    """The CSV file does not have the stroke dataset's columns."""
+
+
+def _column(values):
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def iter_blocks(rows, block_rows=5000):
+    """
+    Yield a Block per block_rows data rows of rows, an iterable of CSV
+    rows (lists of strings) whose first row is the header. Rows with the
+    wrong number of fields are left out of the columns and reported in
+    rejects.
+    """
+    rows = iter(rows)
+    header = list(next(rows, None) or [])
+    missing = [col for col in CSV_HEADER if col not in header]
+    if missing:
+        raise CSVHeaderError(f"missing column(s): {', '.join(missing)}")
+    positions = [header.index(col) for col in CSV_HEADER]
+    width = len(header)
+
+    first = 2  # the first data row
+    while True:
+        block = list(islice(rows, block_rows))
+        if not block:
+            return
+        lines = np.arange(first, first + len(block))
+        rejects = []
+        widths = np.fromiter(map(len, block), dtype=np.int64, count=len(block))
+        ragged = widths != width
+        if ragged.any():
+            for i in np.flatnonzero(ragged).tolist():
+                rejects.append({
+                    "row": first + i,
+                    "error": f"expected {width} fields, found {widths[i]}",
+                    "fields": {},
+                })
+            block = [row for row, bad in zip(block, ragged.tolist()) if not bad]
+            lines = lines[~ragged]
+
+        transposed = list(zip(*block)) if block else [()] * width
+        columns = {col: _column(transposed[pos]) for col, pos in zip(CSV_HEADER, positions)}
+        columns["_line"] = lines
+        yield Block(first, first + len(widths) - 1, len(widths), columns, rejects)
+        first += len(widths)
+
+
+def read_blocks(csv_path, block_rows=5000):
+    """iter_blocks over the rows of the CSV file csv_path."""
+    with open(csv_path, newline="") as f:
+        yield from iter_blocks(csv.reader(f), block_rows)
+
+
+def _parse_ints(raw):
+    """
+    (int64 values, blank mask, bad mask) of a column of integer strings;
+    0 where blank or bad. Bad values are those app.codec rejects.
+    """
+    blank = (raw == "") | (raw == CSV_MISSING)
+    filled = raw.copy()
+    filled[blank] = "0"
+    try:
+        # int() semantics: exact, surrounding whitespace is allowed
+        return filled.astype(np.int64), blank, np.zeros(len(raw), dtype=bool)
+    except (ValueError, OverflowError):
+        pass
+    # "1.0", a padded sentinel, a bad or too large value: one at a time
+    convert = CONVERTERS[int]
+    values = np.zeros(len(raw), dtype=np.int64)
+    bad = np.zeros(len(raw), dtype=bool)
+    for i, text in enumerate(raw.tolist()):
+        text = text.strip()
+        if text in ("", CSV_MISSING):
+            blank[i] = True
+            continue
+        try:
+            values[i] = convert(text)
+        except (ValueError, OverflowError):
+            bad[i] = True
+    return values, blank, bad
+
+
+def _parse_floats(raw):
+    """(float64 values, blank mask) of a column of numeric strings; NaN where blank or unparsable."""
+    blank = (raw == "") | (raw == CSV_MISSING)
+    filled = raw.copy()
+    filled[blank] = "nan"
+    try:
+        # float() semantics: surrounding whitespace is allowed
+        return filled.astype(np.float64), blank
+    except ValueError:
+        pass
+    # a padded sentinel or a bad value somewhere: convert one at a time
+    values = np.empty(len(raw), dtype=np.float64)
+    for i, text in enumerate(raw.tolist()):
+        text = text.strip()
+        if text in ("", CSV_MISSING):
+            blank[i] = True
+            values[i] = np.nan
+            continue
+        try:
+            values[i] = float(text)
+        except ValueError:
+            values[i] = np.nan
+    return values, blank
+
+
+def _check_column(field, raw):
+    """
+    (values, missing, problems) for one column: values as an array
+    (int64 or float64 for numbers, the strings otherwise), the missing
+    mask, and a list of (mask, message) rule violations, in app.codec's
+    order.
+    """
+    if field.type is str:
+        blank = raw == ""
+        if not field.required:
+            blank |= raw == CSV_MISSING
+        blank |= np.fromiter(map(str.isspace, raw), dtype=bool, count=len(raw))
+        values = raw
+        bad = np.zeros(len(raw), dtype=bool)
+    elif field.type is int:
+        values, blank, bad = _parse_ints(raw)
+    else:
+        values, blank = _parse_floats(raw)
+        # NaN/inf in the file, or text that is not a number
+        bad = ~blank & ~np.isfinite(values)
+
+    # a bad value is reported once, as a type error, and then counts as missing
+    problems = [(bad, TYPE_MESSAGES[field.type])]
+    missing = blank | bad
+    present = ~missing
+    if field.required:
+        problems.append((blank, REQUIRED_MESSAGE))
+    if field.choices is not None:
+        allowed = np.zeros(len(raw), dtype=bool)
+        for choice in field.choices:
+            allowed |= values == choice
+        problems.append((present & ~allowed, CHOICE_MESSAGE))
+    if field.min is not None:
+        with np.errstate(invalid="ignore"):
+            out_of_range = values < field.min
+            if field.max is not None:
+                out_of_range |= values > field.max
+        problems.append((present & out_of_range, range_message(field)))
+    if field.max_length is not None:
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        problems.append((present & (lengths > field.max_length), length_message(field)))
+    return values, missing, problems
+
+
+def _to_list(values, missing):
+    """Python values for the kept rows, None where missing."""
+    listed = values.tolist()
+    for i in np.flatnonzero(missing).tolist():
+        listed[i] = None
+    return listed
+
+
+def parse_block(block):
+    """Convert a Block into a ParsedBlock of documents and rejects."""
+    lines = block.columns["_line"]
+    checked = [_check_column(field, block.columns[field.column]) for field in FIELDS]
+
+    rejected = np.zeros(len(lines), dtype=bool)
+    for _, _, problems in checked:
+        for mask, _ in problems:
+            rejected |= mask
+
+    rejects = list(block.rejects)
+    for i in np.flatnonzero(rejected).tolist():
+        errors = {}
+        for field, (_, _, problems) in zip(FIELDS, checked):
+            messages = [message for mask, message in problems if mask[i]]
+            if messages:
+                errors[field.name] = messages
+        rejects.append({"row": int(lines[i]), "error": str(PatientError(errors)), "fields": errors})
+    rejects.sort(key=lambda r: r["row"])
+
+    keep = ~rejected
+    columns = [_to_list(values[keep], missing[keep]) for values, missing, _ in checked]
+    docs = list(map(make_document, *columns))
+    return ParsedBlock(block.first_line, block.last_line, block.size, docs, lines[keep].tolist(), rejects)
+
+
+def ingest_rows(rows, block_rows=5000):
+    """Yield a ParsedBlock per block of rows (the header first, as for iter_blocks)."""
+    for block in iter_blocks(rows, block_rows):
+        yield parse_block(block)
+
+
+def ingest_csv(csv_path, block_rows=5000):
+    """Yield a ParsedBlock per block of csv_path."""
+    for block in read_blocks(csv_path, block_rows):
+        yield parse_block(block)
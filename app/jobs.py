@@ -0,0 +1,193 @@
+"""
+In-process background jobs for long operations (import, export, risk
+rescoring, statistics rebuilds).
+
+``JobRunner`` runs jobs on a bounded thread pool inside the web process
+and needs no external broker. Each job gets an id, a status, a progress
+counter and a cancellation flag. The routes in app/routes/jobs.py start
+jobs and let clients poll them. Job state is kept in memory, so a job is
+only visible to the process that runs it.
+
+A task is a function ``fn(job, *args)`` that runs inside an app context.
+It should call ``job.report(done, total)`` as it goes. ``report`` raises
+JobCancelled once cancellation was requested, which ends the task at the
+next progress step. Files a task leaves behind for the client (an export)
+are listed in ``job.files`` and deleted when the job record is dropped.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a task when its job was cancelled."""
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are queued or running."""
+
+
+class JobConflict(Exception):
+    """An exclusive job of the same kind is already active."""
+
+    def __init__(self, job):
+        super().__init__(f"a {job.kind} job is already {job.status}")
+        self.job = job
+
+
+class Job:
+    def __init__(self, kind, owner=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.status = QUEUED
+        self.done = 0
+        self.total = None
+        self.message = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = self.finished_at = None
+        self.future = None
+        self.files = []  # output files, deleted with the job record
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.status not in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def report(self, done, total=None, message=None):
+        """Record progress; raises JobCancelled if the job was cancelled."""
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def remove_files(self):
+        for path in self.files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                log.warning("Could not delete %s of job %s", path, self.id, exc_info=True)
+        self.files = []
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "progress": round(self.done / self.total, 4) if self.total else None,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "cancel_requested": self.cancel_requested,
+        }
+
+
+class JobRunner:
+    """
+    Bounded pool of background jobs. At most max_workers run at once and
+    at most max_queued more wait; further submissions raise JobQueueFull.
+    The last keep finished jobs are remembered for polling; older ones
+    are forgotten and their files deleted.
+    """
+
+    def __init__(self, max_workers=2, max_queued=8, keep=100):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.keep = keep
+        self.app = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get("JOB_WORKERS", self.max_workers)
+        self.max_queued = app.config.get("JOB_QUEUE_LIMIT", self.max_queued)
+        with self._lock:
+            if self._executor is not None and self._executor._max_workers != self.max_workers:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def submit(self, kind, fn, *args, owner=None, exclusive=False):
+        """Queue fn(job, *args); returns the Job."""
+        with self._lock:
+            active = [j for j in self._jobs.values() if j.active]
+            if exclusive:
+                for other in active:
+                    if other.kind == kind:
+                        raise JobConflict(other)
+            if len(active) >= self.max_workers + self.max_queued:
+                raise JobQueueFull(f"{len(active)} jobs are already queued or running")
+            job = Job(kind, owner)
+            self._jobs[job.id] = job
+            self._trim()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="job")
+            job.future = self._executor.submit(self._run, self.app, job, fn, args)
+        return job
+
+    def _run(self, app, job, fn, args):
+        if job.cancel_requested:
+            job.status, job.finished_at = CANCELLED, time.time()
+            return
+        job.status, job.started_at = RUNNING, time.time()
+        try:
+            with app.app_context():
+                job.result = fn(job, *args)
+            job.status = SUCCEEDED
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            log.exception("Job %s (%s) failed", job.id, job.kind)
+            job.status, job.error = FAILED, f"{type(e).__name__}: {e}"
+        finally:
+            job.finished_at = time.time()
+
+    def _trim(self):
+        finished = [j.id for j in self._jobs.values() if not j.active]
+        for job_id in finished[: max(len(finished) - self.keep, 0)]:
+            self._jobs.pop(job_id).remove_files()
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id):
+        """Request cancellation; a queued job never starts. Returns the Job or None."""
+        job = self._jobs.get(job_id)
+        if job is not None and job.active:
+            job._cancel.set()
+            if job.future is not None and job.future.cancel():
+                job.status, job.finished_at = CANCELLED, time.time()
+        return job
+
+
+jobs = JobRunner()
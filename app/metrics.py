@@ -0,0 +1,261 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Four sources feed the registry:
+
+* request timing hooks registered by ``init_metrics`` (one histogram
+  series per blueprint endpoint and method, plus a status code counter),
+* ``MongoCommandListener``, passed to PyMongo as an event listener, which
+  times every command sent to MongoDB,
+* SQLAlchemy ``before/after_cursor_execute`` events on the SQLite engine,
+* the hit/miss/eviction counters of caches added with ``register_cache``.
+
+Everything is rendered at ``/metrics``. Recording a sample is a
+perf_counter call, a bisect and a dict update under a lock.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+from pymongo import monitoring
+from sqlalchemy import event
+
+# upper bounds in seconds; +Inf is implied
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, labels=()):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._series.items())
+        bounds = [_number(b) for b in self.buckets] + ["+Inf"]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                label_text = _labels(self.labelnames, labels, [("le", bound)])
+                yield f"{self.name}_bucket{label_text} {cumulative}"
+            label_text = _labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_number(total)}"
+            yield f"{self.name}_count{label_text} {count}"
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, by endpoint.",
+    ("endpoint", "method"),
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "Requests handled, by endpoint and status code.",
+    ("endpoint", "method", "status"),
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds",
+    "Round-trip time of MongoDB commands.",
+    ("command", "collection"),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total",
+    "MongoDB commands that returned an error.",
+    ("command", "collection"),
+)
+SQL_QUERY_LATENCY = Histogram(
+    "sqlalchemy_query_duration_seconds",
+    "Execution time of SQL statements, by statement type.",
+    ("statement",),
+)
+
+REGISTRY = [REQUEST_LATENCY, REQUESTS, MONGO_COMMAND_LATENCY, MONGO_COMMAND_FAILURES, SQL_QUERY_LATENCY]
+
+# name -> cache with a stats() method (app/cache.py)
+CACHES = {}
+CACHE_METRICS = [
+    ("app_cache_hits_total", "counter", "hits", "Cache lookups that found a live entry."),
+    ("app_cache_misses_total", "counter", "misses", "Cache lookups that found nothing or an expired entry."),
+    ("app_cache_evictions_total", "counter", "evictions", "Entries dropped to stay within maxsize."),
+    ("app_cache_expirations_total", "counter", "expirations", "Entries dropped because their TTL ran out."),
+    ("app_cache_entries", "gauge", "entries", "Entries currently held."),
+]
+
+
+def register_cache(name, cache):
+    """Report cache.stats() at /metrics under cache="name"."""
+    CACHES[name] = cache
+
+
+def _cache_lines():
+    stats = {name: cache.stats() for name, cache in sorted(CACHES.items())}
+    for metric, kind, key, documentation in CACHE_METRICS:
+        yield f"# HELP {metric} {documentation}"
+        yield f"# TYPE {metric} {kind}"
+        for name, values in stats.items():
+            yield f'{metric}{{cache="{_escape(name)}"}} {values[key]}'
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    lines.extend(_cache_lines())
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    for metric in REGISTRY:
+        metric.clear()
+
+
+# ---------- Flask ----------
+
+def _start_timer():
+    g._metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop("_metrics_started", None)
+    if started is not None:
+        endpoint = request.endpoint or "unmatched"  # 404s share one series
+        REQUEST_LATENCY.observe((endpoint, request.method), time.perf_counter() - started)
+        REQUESTS.inc((endpoint, request.method, str(response.status_code)))
+    return response
+
+
+# ---------- MongoDB ----------
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command a MongoClient sends (incl. getMore)."""
+
+    def __init__(self):
+        self._collections = {}  # (connection, request_id) -> collection name
+
+    @staticmethod
+    def _key(event):
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        self._collections[self._key(event)] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop(self._key(event), "")
+        MONGO_COMMAND_LATENCY.observe((event.command_name, collection), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop(self._key(event), "")
+        MONGO_COMMAND_LATENCY.observe((event.command_name, collection), event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.inc((event.command_name, collection))
+
+
+mongo_listener = MongoCommandListener()
+
+
+# ---------- SQLAlchemy ----------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["_metrics_started"].pop()
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    SQL_QUERY_LATENCY.observe((kind,), time.perf_counter() - started)
+
+
+def _handle_error(context):
+    # after_cursor_execute does not run for a failed statement
+    started = context.connection.info.get("_metrics_started") if context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine):
+    """Attach the SQL timing events to engine (once)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def init_metrics(app):
+    """Register the request timing hooks on app."""
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
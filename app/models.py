@@ -1,4 +1,5 @@
 from app import db, login_manager
+from app.cache import TTLCache
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -17,6 +18,23 @@ class User(UserMixin, db.Model):
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
 
+# Identity cache for load_user, so current_user costs no SQLite query.
+# Role changes must call invalidate_user(); create_app sizes and clears it.
+user_cache = TTLCache(maxsize=1024, ttl=300)
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            # detach it so it outlives this request's session
+            db.session.expunge(user)
+            user_cache.set(user_id, user)
+    return user
+
+
+def invalidate_user(user_id):
+    user_cache.invalidate(int(user_id))
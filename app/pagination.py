@@ -0,0 +1,83 @@
+"""
+Keyset (seek) pagination over the indexed ``_id`` key.
+
+Pages are addressed by opaque cursor tokens instead of page offsets, so
+MongoDB seeks straight to the first row of a page through the _id index
+and deep pages cost the same as the first one.
+"""
+import base64
+import binascii
+
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+
+
+def encode_cursor(oid):
+    """ObjectId -> short URL-safe token."""
+    return base64.urlsafe_b64encode(ObjectId(oid).binary).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Token -> ObjectId, or None if the token is missing or malformed."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        return ObjectId(raw)
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        return None
+
+
+def seek_clause(after=None, before=None):
+    """(filter on _id, sort direction, backwards) for a page request."""
+    if before is not None and after is None:
+        return {"_id": {"$lt": before}}, -1, True
+    if after is not None:
+        return {"_id": {"$gt": after}}, 1, False
+    return {}, 1, False
+
+
+def page_cursors(docs, per_page, after=None, before=None):
+    """
+    Turn up to per_page + 1 rows fetched in seek order into
+    (docs, next_cursor, prev_cursor).
+    """
+    backwards = before is not None and after is None
+    more = len(docs) > per_page
+    docs = docs[:per_page]
+
+    if backwards:
+        docs.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = after is not None, more
+
+    if not docs:
+        return docs, None, None
+    next_cursor = encode_cursor(docs[-1]["_id"]) if has_next else None
+    prev_cursor = encode_cursor(docs[0]["_id"]) if has_prev else None
+    return docs, next_cursor, prev_cursor
+
+
+def keyset_page(coll, query, per_page, after=None, before=None, projection=None):
+    """
+    Fetch one page of coll matching query, ordered by _id.
+
+    ``after`` / ``before`` are ObjectIds from decode_cursor. Returns
+    (docs, next_cursor, prev_cursor); a cursor is None when there is no
+    page in that direction.
+    """
+    seek, order, _ = seek_clause(after, before)
+
+    if query and seek:
+        match = {"$and": [query, seek]}
+    else:
+        match = query or seek
+
+    # one extra row tells us whether another page exists
+    docs = list(
+        coll.find(match, projection)
+        .sort([("_id", order)])
+        .limit(per_page + 1)
+    )
+    return page_cursors(docs, per_page, after, before)
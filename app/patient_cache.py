@@ -0,0 +1,42 @@
+"""
+Read-through cache of patient documents, keyed by ObjectId.
+
+patient_detail and edit_patient read patients through ``get_patient``.
+Writers call ``invalidate_patient`` for every document they replace or
+delete, bulk writers included: the import job and the bulk endpoint
+invalidate each changed patient. The TTL (PATIENT_CACHE_TTL) bounds how
+stale a document can be when another process wrote it.
+"""
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+
+from app import mongo
+from app.cache import TTLCache
+
+# create_app sizes and clears it
+patient_cache = TTLCache(maxsize=2048, ttl=60)
+
+
+def get_patient(patient_id):
+    """
+    The patient document for an ObjectId (or its hex string), or None if
+    the id is invalid or no such patient exists. Misses are not cached.
+    """
+    try:
+        oid = ObjectId(patient_id)
+    except (InvalidId, TypeError):
+        return None
+    doc = patient_cache.get(oid)
+    if doc is None:
+        doc = mongo.db.patients.find_one({"_id": oid})
+        if doc is not None:
+            patient_cache.set(oid, doc)
+    # callers get their own copy to modify
+    return dict(doc) if doc is not None else None
+
+
+def invalidate_patient(patient_id):
+    try:
+        patient_cache.invalidate(ObjectId(patient_id))
+    except (InvalidId, TypeError):
+        pass
@@ -0,0 +1,135 @@
+"""
+Vectorized stroke-risk scoring.
+
+A logistic model over the PatientForm features (age, hypertension,
+heart_disease, avg_glucose_level, bmi, smoking_status). Scores are computed
+for whole batches at once with NumPy and stored on each patient as
+``risk_score`` (probability, 0-1) and ``risk_band``, so the dashboard can
+read the top-K and band counts from indexes instead of scanning.
+
+The coefficients are a fit on the bundled stroke dataset, rounded; they
+rank patients, they are not a clinical tool.
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+from pymongo import UpdateOne
+
+from app.patient_cache import invalidate_patient
+
+INTERCEPT = -7.6
+COEFFICIENTS = {
+    "age": 0.072,
+    "hypertension": 0.42,
+    "heart_disease": 0.33,
+    "avg_glucose_level": 0.0042,
+    "bmi": 0.004,
+}
+SMOKING_COEFFICIENTS = {"formerly smoked": 0.18, "smokes": 0.30}
+
+# missing bmi / glucose are scored at the dataset mean
+FILL_VALUES = {"avg_glucose_level": 106.1, "bmi": 28.9}
+
+# (band, upper bound exclusive); the last band is open ended
+RISK_BANDS = [("low", 0.05), ("medium", 0.15), ("high", None)]
+RISK_BAND_NAMES = [name for name, _ in RISK_BANDS]
+
+# document fields the model reads
+FEATURE_PROJECTION = {field: 1 for field in list(COEFFICIENTS) + ["smoking_status"]}
+
+
+def _numeric(docs, field, fill=0.0):
+    values = np.fromiter(
+        (
+            v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan
+            for v in (d.get(field) for d in docs)
+        ),
+        dtype=np.float64,
+        count=len(docs),
+    )
+    return np.where(np.isnan(values), fill, values)
+
+
+def feature_columns(docs):
+    """Patient documents -> {feature: np.ndarray} ready for score_columns."""
+    docs = list(docs)
+    columns = {
+        field: _numeric(docs, field, FILL_VALUES.get(field, 0.0))
+        for field in COEFFICIENTS
+    }
+    columns["smoking"] = np.fromiter(
+        (SMOKING_COEFFICIENTS.get(d.get("smoking_status"), 0.0) for d in docs),
+        dtype=np.float64,
+        count=len(docs),
+    )
+    return columns
+
+
+def score_columns(columns):
+    """Vectorized risk probability for a batch of feature columns."""
+    logit = np.full_like(columns["age"], INTERCEPT)
+    for field, coef in COEFFICIENTS.items():
+        logit += coef * columns[field]
+    logit += columns["smoking"]
+    return 1.0 / (1.0 + np.exp(-logit))
+
+
+def risk_bands(scores):
+    """Vectorized band name for every score."""
+    edges = [upper for _, upper in RISK_BANDS if upper is not None]
+    return np.asarray(RISK_BAND_NAMES)[np.digitize(scores, edges)]
+
+
+def score_documents(docs):
+    """[{"risk_score": ..., "risk_band": ...}, ...] for a batch of documents."""
+    docs = list(docs)
+    if not docs:
+        return []
+    scores = score_columns(feature_columns(docs)).round(4)
+    return [
+        {"risk_score": float(s), "risk_band": str(b)}
+        for s, b in zip(scores, risk_bands(scores))
+    ]
+
+
+def rescore_collection(coll, batch_size=5000, on_progress=None):
+    """
+    Re-score every patient in batches, writing only changed scores with
+    one unordered bulk_write per batch. A changed patient gets a new
+    updated_at (for app.analytics) and is dropped from the patient cache.
+    Returns the number updated. on_progress(scanned, updated), if given,
+    is called after every batch.
+    """
+    projection = {**FEATURE_PROJECTION, "risk_score": 1, "risk_band": 1}
+    updated = scanned = 0
+    batch = []
+
+    def flush(batch):
+        now = datetime.now(timezone.utc)
+        changed = [
+            (doc["_id"], fields)
+            for doc, fields in zip(batch, score_documents(batch))
+            if doc.get("risk_score") != fields["risk_score"]
+            or doc.get("risk_band") != fields["risk_band"]
+        ]
+        if not changed:
+            return 0
+        ops = [UpdateOne({"_id": oid}, {"$set": {**fields, "updated_at": now}}) for oid, fields in changed]
+        modified = coll.bulk_write(ops, ordered=False).modified_count
+        for oid, _ in changed:
+            invalidate_patient(oid)
+        return modified
+
+    for doc in coll.find({}, projection, batch_size=batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            updated += flush(batch)
+            scanned += len(batch)
+            batch = []
+            if on_progress is not None:
+                on_progress(scanned, updated)
+    if batch:
+        updated += flush(batch)
+        if on_progress is not None:
+            on_progress(scanned + len(batch), updated)
+    return updated
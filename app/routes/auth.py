@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required
-from app.models import User
+from app.models import User, invalidate_user
 from app import db
 from app.forms import LoginForm, RegisterForm
 from werkzeug.security import generate_password_hash
@@ -56,6 +56,7 @@ def register():
             db.session.rollback()
             flash("Username or email already exists. Please use a different one.", "danger")
             return render_template("auth/register.html", form=form)
+        invalidate_user(user.id)
 
         flash(f"Registration successful. Assigned role: {role}. Please log in.", "success")
         return redirect(url_for("auth.login"))
@@ -79,6 +80,7 @@ def make_admin(user_id):
     if user.role != "admin":
         user.role = "admin"
         db.session.commit()
+        invalidate_user(user.id)
         flash(f"User {user.username} promoted to ADMIN.", "success")
     else:
         flash(f"User {user.username} is already admin.", "info")
@@ -97,6 +99,7 @@ def make_staff(user_id):
     if user.role != "staff":
         user.role = "staff"
         db.session.commit()
+        invalidate_user(user.id)
         flash(f"User {user.username} set to STAFF.", "success")
     else:
         flash(f"User {user.username} is already staff.", "info")
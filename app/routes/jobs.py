@@ -0,0 +1,117 @@
+import os
+
+from flask import Blueprint, abort, current_app, jsonify, request, send_file, url_for
+from flask_login import current_user, login_required
+
+from app.decorators import admin_required
+from app.filters import list_query
+from app.jobs import SUCCEEDED, JobConflict, JobQueueFull, jobs
+from app.tasks import EXPORT_ENCODERS, export_task, rebuild_stats_task, rescore_task
+
+jobs_bp = Blueprint("jobs", __name__, url_prefix="/jobs")
+
+
+def export_dir():
+    path = current_app.config.get("EXPORT_DIR") or os.path.join(current_app.instance_path, "exports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def submit(kind, fn, *args, exclusive=False):
+    """
+    Start a job and answer 202 with its status URL, 409 if an exclusive
+    job of this kind is already active, or 429 if the queue is full.
+    """
+    try:
+        job = jobs.submit(kind, fn, *args, owner=current_user.get_id(), exclusive=exclusive)
+    except JobConflict as e:
+        return jsonify(error=str(e), job=e.job.to_dict()), 409
+    except JobQueueFull as e:
+        return jsonify(error=str(e)), 429
+    status_url = url_for("jobs.job_status", job_id=job.id)
+    return jsonify({**job.to_dict(), "status_url": status_url}), 202, {"Location": status_url}
+
+
+def visible_job(job_id):
+    """The job, if the current user started it or is an admin; else 404."""
+    job = jobs.get(job_id)
+    if job is None or (job.owner != current_user.get_id() and getattr(current_user, "role", None) != "admin"):
+        abort(404)
+    return job
+
+
+@jobs_bp.route("/")
+@login_required
+@admin_required
+def list_jobs():
+    return jsonify(jobs=[job.to_dict() for job in jobs.list()])
+
+
+@jobs_bp.route("/<job_id>")
+@login_required
+def job_status(job_id):
+    return jsonify(visible_job(job_id).to_dict())
+
+
+@jobs_bp.route("/<job_id>/cancel", methods=["POST"])
+@login_required
+def cancel_job(job_id):
+    """Ask a job to stop; it ends at its next progress report."""
+    job = jobs.cancel(visible_job(job_id).id)
+    return jsonify(job.to_dict())
+
+
+@jobs_bp.route("/export", methods=["POST"])
+@login_required
+def start_export():
+    """
+    Write the patients matching ?q= and the list filters to a file in the
+    background (?format=ndjson|csv, ?gzip=1); fetch it from
+    /jobs/<id>/download.
+    """
+    fmt = request.values.get("format", "ndjson")
+    if fmt not in EXPORT_ENCODERS:
+        return jsonify(error=f"Unknown export format: {fmt}"), 400
+    compress = request.values.get("gzip") == "1"
+    return submit("export", _export, fmt, list_query(request.values), export_dir(), compress)
+
+
+def export_filename(stem, fmt, compress):
+    return f"{stem}.{fmt}" + (".gz" if compress else "")
+
+
+def _export(job, fmt, query, directory, compress):
+    path = os.path.join(directory, export_filename(job.id, fmt, compress))
+    return export_task(job, fmt, query, path, compress)
+
+
+@jobs_bp.route("/<job_id>/download")
+@login_required
+def download_export(job_id):
+    job = visible_job(job_id)
+    if job.kind != "export" or job.status != SUCCEEDED:
+        abort(404)
+    fmt, compress = job.result["format"], job.result["gzip"]
+    path = os.path.join(export_dir(), export_filename(job.id, fmt, compress))
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=export_filename("patients", fmt, compress))
+
+
+@jobs_bp.route("/rescore", methods=["POST"])
+@login_required
+@admin_required
+def start_rescore():
+    """Re-score stroke risk for every patient (as ``flask rescore-risk``)."""
+    batch_size = request.values.get("batch_size", 5000, type=int)
+    if batch_size < 1:
+        return jsonify(error="batch_size must be a positive integer"), 400
+    return submit("rescore", rescore_task, batch_size, exclusive=True)
+
+
+@jobs_bp.route("/rebuild-stats", methods=["POST"])
+@login_required
+@admin_required
+def start_rebuild_stats():
+    """Recompute the dashboard statistics (as ``flask rebuild-stats``)."""
+    return submit("rebuild-stats", rebuild_stats_task, exclusive=True)
@@ -1,6 +1,9 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, Response, jsonify, make_response, render_template
 from flask_login import login_required
-from app import mongo
+from app import metrics, slowlog
+from app.conditional import cacheable, not_modified, page_etag
+from app.decorators import admin_required
+from app.stats import get_dashboard_context, stats_version
 
 # Blueprint name MUST be "main" so endpoints are "main.index", "main.dashboard"
 main_bp = Blueprint("main", __name__)
@@ -19,24 +22,32 @@ def dashboard():
     Analytics dashboard at URL: /dashboard
     Endpoint: main.dashboard
     """
-    try:
-        coll = mongo.db.patients
-        total = coll.count_documents({})
-        stroke_yes = coll.count_documents({"stroke": 1})
-        stroke_no = coll.count_documents({"stroke": 0})
-
-        genders = ["Male", "Female", "Other"]
-        gender_counts = [coll.count_documents({"gender": g}) for g in genders]
-    except Exception:
-        total = stroke_yes = stroke_no = 0
-        genders = []
-        gender_counts = []
-
-    return render_template(
-        "dashboard.html",
-        total=total,
-        stroke_yes=stroke_yes,
-        stroke_no=stroke_no,
-        genders=genders,
-        gender_counts=gender_counts,
+    etag = page_etag(stats_version())
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    return cacheable(make_response(render_template("dashboard.html", **get_dashboard_context())), etag)
+
+
+@main_bp.route("/metrics")
+def metrics_endpoint():
+    """
+    Prometheus scrape target at URL: /metrics
+    Endpoint: main.metrics_endpoint
+    """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@main_bp.route("/slow-queries")
+@login_required
+@admin_required
+def slow_queries():
+    """
+    Slow MongoDB queries grouped by shape, as JSON, at URL: /slow-queries
+    Endpoint: main.slow_queries
+    """
+    return jsonify(
+        threshold_ms=slowlog.listener.threshold_ms,
+        shapes=slowlog.listener.slow_queries(),
+        recent=slowlog.listener.recent(),
     )
@@ -6,26 +6,64 @@ from flask import (
     flash,
     current_app,
     request,
+    Response,
+    jsonify,
+    make_response,
 )
-from flask_login import login_required
+from flask_login import current_user, login_required
 from app import mongo
 from bson.objectid import ObjectId
 from app.forms import PatientForm
-from pymongo.errors import ServerSelectionTimeoutError
-import csv
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
 import os
+from collections import Counter
+from app.bulk import BulkRequestError, parse_operations, run_bulk
+from app.codec import Patient, PatientError
 from app.decorators import admin_required
+from app.jobs import JobConflict, JobQueueFull, jobs
+from app.analytics import CATEGORICAL_FIELDS, FLAG_FIELDS, NUMERIC_FIELDS, cohort_histogram, get_snapshot
+from app.conditional import cacheable, not_modified, page_etag
+from app.derived import add_derived_fields
+from app.export import EXPORT_PROJECTION, csv_chunks, gzip_chunks, ndjson_chunks
+from app.filters import CHOICE_OPTIONS, faceted_page, list_query, parse_filters
+from app.pagination import decode_cursor, keyset_page
+from app.patient_cache import get_patient, invalidate_patient
+from app.tasks import import_task
+from app.stats import (
+    STATS_PROJECTION,
+    apply_delta,
+    get_dashboard_context,
+    load_stats,
+    stats_version,
+)
 
 
 patients_bp = Blueprint("patients", __name__, url_prefix="/patients")
 
+@patients_bp.errorhandler(ServerSelectionTimeoutError)
+def mongo_unavailable(e):
+    """
+    Degraded-mode response for routes without their own handler. With the
+    circuit breaker open (app/breaker.py) this is immediate.
+    """
+    flash("MongoDB is not available right now. Please try again shortly.", "danger")
+    return redirect(url_for("patients.list_patients"))
+
+
+# Fields rendered by patients/list.html (_id is always returned)
+LIST_PROJECTION = {"patient_id": 1, "gender": 1, "age": 1, "stroke": 1}
+
 
 # ---------- LIST + SEARCH ----------
 @patients_bp.route("/")
 @login_required
 def list_patients():
     """
-    List patients, with optional search (?q=) and pagination (?page=)
+    List patients, with optional search (?q=), structured filters
+    (app/filters.py) and keyset pagination (?after=<cursor> /
+    ?before=<cursor>, ordered by _id). A filtered page also shows facet
+    counts, fetched with the page in one aggregation.
     """
     dummy_patients = [
         {"_id": 1, "patient_id": 1001, "gender": "Male", "age": 45, "stroke": 0},
@@ -33,31 +71,40 @@ def list_patients():
     ]
 
     q = request.args.get("q", "").strip()
-    page = request.args.get("page", 1, type=int)
+    page = max(request.args.get("page", 1, type=int), 1)
+    after = decode_cursor(request.args.get("after"))
+    before = decode_cursor(request.args.get("before"))
+    # the count of a search is computed once and carried in the page links
+    total = request.args.get("total", type=int)
     per_page = 50  # patients per page
 
-    query = {}
-    if q:
-        try:
-            num = int(q)
-            query["patient_id"] = num
-        except ValueError:
-            query["$or"] = [
-                {"gender": {"$regex": q, "$options": "i"}},
-                {"smoking_status": {"$regex": q, "$options": "i"}},
-                {"work_type": {"$regex": q, "$options": "i"}},
-            ]
+    filters = parse_filters(request.args)
+    query = list_query(request.args)
 
+    # every patient write bumps the stats version: nothing changed, no queries
+    etag = page_etag(stats_version())
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    next_cursor = prev_cursor = facets = None
     try:
-        total = mongo.db.patients.count_documents(query)
-        cursor = (
-            mongo.db.patients.find(query)
-            .skip((page - 1) * per_page)
-            .limit(per_page)
-        )
-        patients = list(cursor)
+        if filters:
+            patients, next_cursor, prev_cursor, total, facets = faceted_page(
+                mongo.db.patients, query, per_page,
+                after=after, before=before, projection=LIST_PROJECTION,
+            )
+        else:
+            if total is None:
+                # unfiltered total comes from the materialized dashboard stats
+                total = mongo.db.patients.count_documents(query) if query else load_stats()["total"]
+
+            patients, next_cursor, prev_cursor = keyset_page(
+                mongo.db.patients, query, per_page,
+                after=after, before=before, projection=LIST_PROJECTION,
+            )
 
-        if total == 0 and not q:
+        if total == 0 and not query:
             flash("MongoDB is connected but no patients are stored yet.", "info")
             patients = dummy_patients
             total = len(dummy_patients)
@@ -70,18 +117,89 @@ def list_patients():
         total = len(dummy_patients)
         per_page = len(dummy_patients)
         page = 1
+        next_cursor = prev_cursor = facets = None
+        etag = None
 
     total_pages = max((total + per_page - 1) // per_page, 1)
 
-    return render_template(
+    return cacheable(make_response(render_template(
         "patients/list.html",
         patients=patients,
         count=total,
         q=q,
+        filters=filters,
+        filter_options=CHOICE_OPTIONS,
+        facets=facets,
         page=page,
         total_pages=total_pages,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+    )), etag)
+
+# ---------- EXPORT ----------
+EXPORT_FORMATS = {
+    "ndjson": (ndjson_chunks, "application/x-ndjson", "patients.ndjson"),
+    "csv": (csv_chunks, "text/csv", "patients.csv"),
+}
+
+
+@patients_bp.route("/export")
+@login_required
+def export_patients():
+    """
+    Stream every patient matching ?q= and the filters (same query as the
+    list page) as ?format=ndjson|csv, gzip-compressed when ?gzip=1.
+    """
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in EXPORT_FORMATS:
+        flash(f"Unknown export format: {fmt}", "danger")
+        return redirect(url_for("patients.list_patients"))
+    encode, mimetype, filename = EXPORT_FORMATS[fmt]
+
+    query = list_query(request.args)
+    cursor = (
+        mongo.db.patients.find(query, EXPORT_PROJECTION)
+        .sort([("_id", 1)])
+        .batch_size(current_app.config.get("EXPORT_BATCH_SIZE", 1000))
     )
 
+    # fetch the first batch now, so a MongoDB outage is reported here
+    # rather than as a truncated download
+    try:
+        first = next(cursor, None)
+    except ServerSelectionTimeoutError:
+        flash("Could not connect to MongoDB to export data.", "danger")
+        return redirect(url_for("patients.list_patients"))
+
+    def docs():
+        if first is not None:
+            yield first
+            yield from cursor
+
+    chunks = encode(docs())
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if request.args.get("gzip") == "1":
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(chunks, mimetype=mimetype, headers=headers)
+
+
+def patient_from_form(form):
+    """
+    The Patient for a submitted form if it passes the form's validators
+    and the patient rules (app/codec.py); otherwise None, with the rule
+    violations added to the form fields' errors.
+    """
+    if not form.validate_on_submit():
+        return None
+    try:
+        return Patient.from_form(form)
+    except PatientError as e:
+        for name, messages in e.errors.items():
+            form[name].errors = list(form[name].errors) + messages
+        return None
+
+
 # ---------- CREATE ----------
 @patients_bp.route("/create", methods=["GET", "POST"])
 @login_required
@@ -89,22 +207,15 @@ def list_patients():
 def create_patient():
     form = PatientForm()
 
-    if form.validate_on_submit():
-        data = {
-            "patient_id": form.patient_id.data,
-            "gender": form.gender.data,
-            "age": form.age.data,
-            "hypertension": form.hypertension.data,
-            "heart_disease": form.heart_disease.data,
-            "ever_married": form.ever_married.data,
-            "work_type": form.work_type.data,
-            "residence_type": form.residence_type.data,
-            "avg_glucose_level": form.avg_glucose_level.data,
-            "bmi": form.bmi.data,
-            "smoking_status": form.smoking_status.data,
-            "stroke": form.stroke.data,
-        }
-        mongo.db.patients.insert_one(data)
+    patient = patient_from_form(form)
+    if patient is not None:
+        data = add_derived_fields(patient.to_document())
+        try:
+            mongo.db.patients.insert_one(data)
+        except DuplicateKeyError:
+            flash(f"A patient with ID {data['patient_id']} already exists.", "danger")
+            return render_template("patients/form.html", form=form, title="Add New Patient", submit_label="Create Patient")
+        apply_delta(added=[data])
         flash("Patient created successfully.", "success")
         return redirect(url_for("patients.list_patients"))
 
@@ -120,7 +231,7 @@ def create_patient():
 @login_required
 def patient_detail(patient_id):
     try:
-        patient = mongo.db.patients.find_one({"_id": ObjectId(patient_id)})
+        patient = get_patient(patient_id)
     except Exception:
         patient = None
 
@@ -128,8 +239,13 @@ def patient_detail(patient_id):
         flash("Patient not found (or MongoDB not available).", "warning")
         return redirect(url_for("patients.list_patients"))
 
-    return render_template("patients/form.html",form=form,title="Edit Patient",submit_label="Save Changes",
-    )
+    # every create/edit stamps updated_at (app/derived.py)
+    etag = page_etag(patient.get("updated_at"))
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    return cacheable(make_response(render_template("patients/detail.html", patient=patient)), etag)
 
 
 # ---------- UPDATE ----------
@@ -138,7 +254,7 @@ def patient_detail(patient_id):
 @admin_required
 def edit_patient(patient_id):
     try:
-        patient = mongo.db.patients.find_one({"_id": ObjectId(patient_id)})
+        patient = get_patient(patient_id)
     except Exception:
         patient = None
 
@@ -150,35 +266,28 @@ def edit_patient(patient_id):
 
     # Pre-populate WTForms fields on GET
     if request.method == "GET":
-        form.patient_id.data = patient.get("patient_id")
-        form.gender.data = patient.get("gender")
-        form.age.data = float(patient.get("age", 0))
-        form.hypertension.data = int(patient.get("hypertension", 0))
-        form.heart_disease.data = int(patient.get("heart_disease", 0))
-        form.ever_married.data = patient.get("ever_married")
-        form.work_type.data = patient.get("work_type")
-        form.residence_type.data = patient.get("residence_type")
-        form.avg_glucose_level.data = float(patient.get("avg_glucose_level", 0))
-        form.bmi.data = patient.get("bmi")
-        form.smoking_status.data = patient.get("smoking_status")
-        form.stroke.data = int(patient.get("stroke", 0))
-
-    if form.validate_on_submit():
-        update = {
-            "patient_id": form.patient_id.data,
-            "gender": form.gender.data,
-            "age": form.age.data,
-            "hypertension": form.hypertension.data,
-            "heart_disease": form.heart_disease.data,
-            "ever_married": form.ever_married.data,
-            "work_type": form.work_type.data,
-            "residence_type": form.residence_type.data,
-            "avg_glucose_level": form.avg_glucose_level.data,
-            "bmi": form.bmi.data,
-            "smoking_status": form.smoking_status.data,
-            "stroke": form.stroke.data,
-        }
-        mongo.db.patients.update_one({"_id": patient["_id"]}, {"$set": update})
+        Patient.from_document(patient).fill_form(form)
+
+    patient_update = patient_from_form(form)
+    if patient_update is not None:
+        update = add_derived_fields(patient_update.to_document())
+        try:
+            # the stored document before the update, not the (possibly
+            # cached) copy above, is what the statistics delta removes
+            before = mongo.db.patients.find_one_and_update(
+                {"_id": patient["_id"]},
+                {"$set": update},
+                projection=STATS_PROJECTION,
+                return_document=ReturnDocument.BEFORE,
+            )
+        except DuplicateKeyError:
+            flash(f"A patient with ID {update['patient_id']} already exists.", "danger")
+            return render_template("patients/form.html", form=form, mode="edit")
+        invalidate_patient(patient["_id"])
+        if before is None:
+            flash("Patient not found.", "warning")
+            return redirect(url_for("patients.list_patients"))
+        apply_delta(removed=[before], added=[{**before, **update}])
         flash("Patient updated successfully.", "success")
         return redirect(url_for("patients.patient_detail", patient_id=patient_id))
 
@@ -194,98 +303,131 @@ def edit_patient(patient_id):
 @admin_required
 def delete_patient(patient_id):
     try:
-        mongo.db.patients.delete_one({"_id": ObjectId(patient_id)})
+        removed = mongo.db.patients.find_one_and_delete(
+            {"_id": ObjectId(patient_id)}, projection=STATS_PROJECTION,
+        )
+        invalidate_patient(patient_id)
+        if removed:
+            apply_delta(removed=[removed])
         flash("Patient deleted.", "info")
     except Exception:
         flash("Could not delete patient.", "danger")
     return redirect(url_for("patients.list_patients"))
 
+
+# ---------- BULK ----------
+@patients_bp.route("/bulk", methods=["POST"])
+@login_required
+@admin_required
+def bulk_patients():
+    """
+    Apply a JSON array of create/update/delete operations keyed by
+    patient_id in one bulk_write (see app/bulk.py). Returns a result per
+    operation. With CSRF enabled, send the token in an X-CSRFToken header.
+    """
+    try:
+        operations = parse_operations(
+            request.get_json(silent=True),
+            current_app.config.get("BULK_MAX_OPERATIONS", 1000),
+        )
+    except BulkRequestError as e:
+        return jsonify(error=str(e)), 400
+
+    try:
+        results, removed, added, touched = run_bulk(mongo.db.patients, operations)
+    except ServerSelectionTimeoutError:
+        return jsonify(error="MongoDB is not available"), 503
+
+    for oid in touched:
+        invalidate_patient(oid)
+    if removed or added:
+        apply_delta(removed=removed, added=added)
+    return jsonify(results=results, summary=Counter(r["status"] for r in results))
+
 @patients_bp.route("/dashboard")
 @login_required
 def dashboard():
-    try:
-        coll = mongo.db.patients
+    etag = page_etag(stats_version())
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    return cacheable(make_response(render_template("dashboard.html", **get_dashboard_context())), etag)
 
-        # basic counts
-        total = coll.count_documents({})
-        stroke_yes = coll.count_documents({"stroke": 1})
-        stroke_no = coll.count_documents({"stroke": 0})
 
-        # stroke rate %
-        if total > 0:
-            stroke_rate = round((stroke_yes / total) * 100, 1)
-        else:
-            stroke_rate = 0.0
-
-        # gender counts
-        genders = ["Male", "Female", "Other"]
-        gender_counts = [coll.count_documents({"gender": g}) for g in genders]
-
-        # ---- if you already have these, keep your versions ----
-        # averages
-        avg_age = avg_glucose = avg_bmi = None
-        pipeline = [
-            {"$group": {
-                "_id": None,
-                "avg_age": {"$avg": "$age"},
-                "avg_glucose": {"$avg": "$avg_glucose_level"},
-                "avg_bmi": {"$avg": "$bmi"},
-            }}
-        ]
-        agg = list(coll.aggregate(pipeline))
-        if agg:
-            avg_age = round(agg[0].get("avg_age", 0), 1)
-            avg_glucose = round(agg[0].get("avg_glucose", 0), 1)
-            avg_bmi = round(agg[0].get("avg_bmi", 0), 1)
-
-        # age bands + high-risk etc...
-        age_bands = ["0–20", "21–40", "41–60", "61–80", "81+"]
-        age_band_counts = [
-            coll.count_documents({"age": {"$gte": 0,  "$lte": 20}}),
-            coll.count_documents({"age": {"$gt": 20, "$lte": 40}}),
-            coll.count_documents({"age": {"$gt": 40, "$lte": 60}}),
-            coll.count_documents({"age": {"$gt": 60, "$lte": 80}}),
-            coll.count_documents({"age": {"$gt": 80}}),
-        ]
-
-        high_risk = list(
-            coll.find({"stroke": 1})
-                .sort([("avg_glucose_level", -1)])
-                .limit(10)
-        )
+# ---------- ANALYTICS ----------
+@patients_bp.route("/analytics")
+@login_required
+def analytics_summary():
+    """
+    Cohort analytics from the in-memory columnar snapshot (app/analytics.py),
+    split by ?by=<gender|work_type|smoking_status>.
+    """
+    by = request.args.get("by", "smoking_status")
+    if by not in CATEGORICAL_FIELDS:
+        return jsonify(error=f"'by' must be one of {', '.join(CATEGORICAL_FIELDS)}"), 400
 
-    except Exception:
-        total = stroke_yes = stroke_no = 0
-        stroke_rate = 0.0
-        genders = []
-        gender_counts = []
-        avg_age = avg_glucose = avg_bmi = None
-        age_bands = []
-        age_band_counts = []
-        high_risk = []
-
-    return render_template(
-        "dashboard.html",
-        total=total,
-        stroke_yes=stroke_yes,
-        stroke_no=stroke_no,
-        stroke_rate=stroke_rate,          # <-- important
-        genders=genders,
-        gender_counts=gender_counts,
-        avg_age=avg_age,
-        avg_glucose=avg_glucose,
-        avg_bmi=avg_bmi,
-        age_bands=age_bands,
-        age_band_counts=age_band_counts,
-        high_risk=high_risk,
+    try:
+        snapshot = get_snapshot(current_app.config.get("SNAPSHOT_MAX_AGE", 30))
+    except ServerSelectionTimeoutError:
+        return jsonify(error="MongoDB is not available"), 503
+
+    return jsonify(
+        patients=snapshot.size,
+        by=by,
+        stroke_rates=snapshot.stroke_rates(by),
+        means={field: snapshot.group_by(by, field) for field in NUMERIC_FIELDS},
+        percentiles={field: snapshot.percentiles(field) for field in NUMERIC_FIELDS},
     )
 
 
+@patients_bp.route("/analytics/histogram")
+@login_required
+def analytics_histogram():
+    """
+    Binned distribution of ?field=<age|avg_glucose_level|bmi>, one series
+    per value of ?split=<stroke|hypertension|...|none> on shared bin
+    edges, over the patients matching the list filters. ?bins= sets the
+    bin count. Cached until the next patient write (app/analytics.py).
+    """
+    field = request.args.get("field", "avg_glucose_level")
+    if field not in NUMERIC_FIELDS:
+        return jsonify(error=f"'field' must be one of {', '.join(NUMERIC_FIELDS)}"), 400
+    split = request.args.get("split", "stroke")
+    if split == "none":
+        split = None
+    elif split not in FLAG_FIELDS + CATEGORICAL_FIELDS:
+        return jsonify(error=f"'split' must be none or one of {', '.join(FLAG_FIELDS + CATEGORICAL_FIELDS)}"), 400
+    max_bins = current_app.config.get("HISTOGRAM_MAX_BINS", 100)
+    bins = request.args.get("bins", current_app.config.get("HISTOGRAM_BINS", 20), type=int)
+    if not 1 <= bins <= max_bins:
+        return jsonify(error=f"'bins' must be between 1 and {max_bins}"), 400
+
+    etag = page_etag(stats_version())
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    try:
+        result = cohort_histogram(
+            field, split, bins, parse_filters(request.args),
+            max_age=current_app.config.get("SNAPSHOT_MAX_AGE", 30),
+        )
+    except ServerSelectionTimeoutError:
+        return jsonify(error="MongoDB is not available"), 503
+    return cacheable(jsonify(result), etag)
+
+
 # ---------- IMPORT FROM CSV ----------
 @patients_bp.route("/import")
 @login_required
 @admin_required
 def import_patients():
+    """
+    Start an incremental import of the bundled CSV as a background job
+    (app/tasks.py) and return at once; its progress is at /jobs/<id>.
+    Only new and changed rows are written (app/importer.py). ?prune=1
+    also deletes patients missing from the file.
+    """
     csv_path = os.path.join(current_app.root_path, "healthcare-dataset-stroke-data.csv")
     csv_path = os.path.abspath(csv_path)
 
@@ -294,36 +436,22 @@ def import_patients():
         return redirect(url_for("patients.list_patients"))
 
     try:
-        mongo.db.patients.delete_many({})
-    except ServerSelectionTimeoutError:
-        flash("Could not connect to MongoDB to import data.", "danger")
+        job = jobs.submit(
+            "import", import_task, csv_path, request.args.get("prune") == "1",
+            owner=current_user.get_id(), exclusive=True,
+        )
+    except JobConflict as e:
+        flash(f"An import is already {e.job.status} (job {e.job.id}).", "warning")
+        return redirect(url_for("patients.list_patients"))
+    except JobQueueFull:
+        flash("Too many background jobs are running. Please try again shortly.", "danger")
         return redirect(url_for("patients.list_patients"))
 
-    inserted = 0
-    with open(csv_path, newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                doc = {
-                    "patient_id": int(row["id"]),
-                    "gender": row["gender"],
-                    "age": float(row["age"]),
-                    "hypertension": int(row["hypertension"]),
-                    "heart_disease": int(row["heart_disease"]),
-                    "ever_married": row["ever_married"],
-                    "work_type": row["work_type"],
-                    "residence_type": row["Residence_type"],
-                    "avg_glucose_level": float(row["avg_glucose_level"]),
-                    "bmi": float(row["bmi"]) if row["bmi"] not in ("", "N/A") else None,
-                    "smoking_status": row["smoking_status"],
-                    "stroke": int(row["stroke"]),
-                }
-                mongo.db.patients.insert_one(doc)
-                inserted += 1
-            except Exception as e:
-                print("Error importing row:", row, e)
-
-    flash(f"Imported {inserted} patients into MongoDB.", "success")
+    flash(
+        f"Import started in the background (job {job.id}). "
+        f"Progress: {url_for('jobs.job_status', job_id=job.id)}",
+        "info",
+    )
     return redirect(url_for("patients.list_patients"))
 
 
@@ -0,0 +1,110 @@
+import pytest
+from bson.objectid import ObjectId
+from pymongo import DeleteOne, InsertOne, UpdateOne
+
+from app import create_app, mongo
+from app.routes.tests.test_app import TestConfig
+
+
+class FakeBulkResult:
+    def __init__(self):
+        self.inserted_count = self.modified_count = self.upserted_count = self.deleted_count = 0
+
+
+class FakeCollection:
+    """
+    Just enough of a pymongo collection for the unit tests: equality, $in
+    and $gte filters, bulk_write of InsertOne / UpdateOne (with upsert) /
+    DeleteOne, and aggregate returning canned results. Reads, writes and
+    pipelines are recorded for assertions.
+    """
+
+    def __init__(self):
+        self.docs = []
+        self.reads = 0
+        self.writes = []  # (ops, ordered) per bulk_write
+        self.pipelines = []
+        self.aggregate_results = []
+
+    @staticmethod
+    def _matches(doc, query):
+        for key, value in query.items():
+            if isinstance(value, dict) and "$in" in value:
+                if doc.get(key) not in value["$in"]:
+                    return False
+            elif isinstance(value, dict) and "$gte" in value:
+                if doc.get(key) is None or doc[key] < value["$gte"]:
+                    return False
+            elif doc.get(key) != value:
+                return False
+        return True
+
+    def _first(self, query):
+        return next((d for d in self.docs if self._matches(d, query)), None)
+
+    def patient(self, patient_id):
+        """The stored document itself (not a copy), to edit behind the code's back."""
+        return self._first({"patient_id": patient_id})
+
+    def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            self.docs.append({"_id": ObjectId(), **doc})
+
+    def find(self, query=None, projection=None, batch_size=None):
+        self.reads += 1
+        return [dict(d) for d in self.docs if self._matches(d, query or {})]
+
+    def find_one(self, query):
+        self.reads += 1
+        doc = self._first(query)
+        return dict(doc) if doc is not None else None
+
+    def bulk_write(self, ops, ordered=True):
+        self.writes.append((ops, ordered))
+        result = FakeBulkResult()
+        for op in ops:
+            if isinstance(op, InsertOne):
+                op._doc.setdefault("_id", ObjectId())
+                self.docs.append(dict(op._doc))
+                result.inserted_count += 1
+            elif isinstance(op, UpdateOne):
+                stored = self._first(op._filter)
+                if stored is None:
+                    if not op._upsert:
+                        continue
+                    stored = {"_id": ObjectId(), **op._filter}
+                    self.docs.append(stored)
+                    result.upserted_count += 1
+                else:
+                    result.modified_count += 1
+                stored.update(op._doc["$set"])
+            elif isinstance(op, DeleteOne):
+                stored = self._first(op._filter)
+                if stored is not None:
+                    self.docs.remove(stored)
+                    result.deleted_count += 1
+        return result
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return iter(self.aggregate_results)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.patients = FakeCollection()
+
+
+@pytest.fixture
+def fake_collection():
+    """An empty FakeCollection; seed it with insert_many."""
+    return FakeCollection()
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """A FakeDatabase in place of mongo.db, in an app created from TestConfig."""
+    create_app(TestConfig)
+    db = FakeDatabase()
+    monkeypatch.setattr(mongo, "db", db)
+    return db
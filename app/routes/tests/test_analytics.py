@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.analytics import CohortSnapshot
+
+DOCS = [
+    {"_id": 1, "gender": "Male", "age": 70.0, "bmi": 30.0, "stroke": 1, "smoking_status": "smokes"},
+    {"_id": 2, "gender": "Female", "age": 30.0, "bmi": None, "stroke": 0, "smoking_status": "smokes"},
+    {"_id": 3, "gender": "Female", "age": 50.0, "bmi": 20.0, "stroke": 1, "smoking_status": None},
+]
+
+
+def test_snapshot_is_columnar_and_dictionary_encoded():
+    snap = CohortSnapshot.from_documents(DOCS)
+    assert snap.size == 3
+    assert snap.categories["gender"] == ["Male", "Female"]
+    assert snap.columns["gender"].tolist() == [0, 1, 1]
+    assert np.isnan(snap.columns["bmi"][1])
+    assert snap.columns["smoking_status"][2] == -1
+
+
+def test_vectorized_queries():
+    snap = CohortSnapshot.from_documents(DOCS)
+    assert snap.stroke_rates("gender")["Female"] == {"patients": 2, "strokes": 1, "rate": 50.0}
+    assert snap.group_by("gender", "bmi") == {"Male": 30.0, "Female": 20.0}
+    assert snap.percentiles("age", qs=(50,)) == {"p50": 50.0}
+
+
+def test_merge_replaces_known_rows_and_appends_new_ones():
+    snap = CohortSnapshot.from_documents(DOCS)
+    merged = snap.merged([
+        {"_id": 2, "gender": "Other", "age": 31.0, "stroke": 1},
+        {"_id": 4, "gender": "Male", "age": 10.0, "stroke": 0},
+    ])
+    assert merged.size == 4
+    assert merged.columns["age"].tolist() == [70.0, 31.0, 50.0, 10.0]
+    assert merged.categories["gender"] == ["Male", "Female", "Other"]
+    # the original snapshot is untouched
+    assert snap.columns["age"].tolist() == [70.0, 30.0, 50.0]
+
+
+def test_split_histogram_shares_edges_and_respects_filters():
+    snap = CohortSnapshot.from_documents(DOCS)
+    hist = snap.split_histogram("age", "stroke", bins=2)
+    assert hist["edges"] == [30.0, 50.0, 70.0]
+    assert hist["series"] == [
+        {"value": 0, "counts": [1, 0], "total": 1},
+        {"value": 1, "counts": [0, 2], "total": 2},
+    ]
+    # missing bmi fails a bmi bound, as in MongoDB
+    mask = snap.mask({"bmi_max": 25.0, "smoking_status": ["smokes", "Unknown"]})
+    assert mask.tolist() == [False, False, False]
+    mask = snap.mask({"age_min": 40.0, "stroke": 1})
+    hist = snap.split_histogram("age", "gender", bins=1, mask=mask)
+    assert [(s["value"], s["counts"]) for s in hist["series"]] == [("Male", [1]), ("Female", [1])]
+
+
+def test_cohort_histogram_is_cached_until_the_stats_version_changes(monkeypatch):
+    from app import analytics
+
+    loads = []
+    version = [1]
+    monkeypatch.setattr(analytics, "stats_version", lambda: version[0])
+    monkeypatch.setattr(
+        analytics, "get_snapshot",
+        lambda max_age, v: loads.append(v) or CohortSnapshot.from_documents(DOCS),
+    )
+    analytics.histogram_cache.clear()
+
+    first = analytics.cohort_histogram("age", "stroke", 2, {"age_min": 40.0})
+    assert analytics.cohort_histogram("age", "stroke", 2, {"age_min": 40.0}) == first
+    assert loads == [1]
+    version[0] = 2  # a patient write
+    analytics.cohort_histogram("age", "stroke", 2, {"age_min": 40.0})
+    assert loads == [1, 2]
+
+
+def test_refresh_rereads_writes_that_committed_behind_the_watermark(fake_collection):
+    from app.analytics import refresh_snapshot
+
+    now = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    fake_collection.insert_many([{**doc, "updated_at": now} for doc in DOCS])
+    snap = refresh_snapshot(None, fake_collection)
+    assert snap.watermark == now
+
+    # an edit stamped before the watermark, but written after the last refresh
+    fake_collection.docs[1]["age"] = 35.0
+    fake_collection.docs[1]["updated_at"] = now - timedelta(seconds=5)
+    snap = refresh_snapshot(snap, fake_collection, expected_size=3)
+    assert snap.columns["age"].tolist() == [70.0, 35.0, 50.0]
+    assert snap.watermark == now
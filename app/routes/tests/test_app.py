@@ -8,6 +8,8 @@ class TestConfig(Config):
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     WTF_CSRF_ENABLED = False  # simplify tests
     MONGO_URI = "mongodb://localhost:27017/patient_app_test"
+    MONGO_ENSURE_INDEXES = False
+    MONGO_WARMUP = False
 
 
 @pytest.fixture
@@ -71,3 +73,24 @@ def test_dashboard_requires_login(client):
     resp = client.get("/dashboard", follow_redirects=False)
     assert resp.status_code == 302
     assert "/auth/login" in resp.headers.get("Location", "")
+
+
+def test_role_change_applies_to_cached_user():
+    # no app context held open here, so every request goes through load_user
+    client = create_app(TestConfig).test_client()
+    register(client, "admin", "admin@example.com")
+    register(client, "staffer", "staff@example.com")
+
+    # staffer's user record is now in the identity cache
+    login(client, "staffer")
+    resp = client.get("/auth/users", follow_redirects=False)
+    assert resp.status_code == 302
+    client.get("/auth/logout")
+
+    login(client, "admin")
+    client.post("/auth/users/2/make-admin")
+    client.get("/auth/logout")
+
+    login(client, "staffer")
+    resp = client.get("/auth/users", follow_redirects=False)
+    assert resp.status_code == 200
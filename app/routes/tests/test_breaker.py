@@ -0,0 +1,46 @@
+import time
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app import create_app, mongo, mongo_breaker
+from app.breaker import CircuitBreaker
+from app.routes.tests.test_app import TestConfig, login, register
+from app.routes.tests.test_cache import FakeClock
+
+
+def test_breaker_opens_after_threshold_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open and not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+
+
+def test_open_breaker_lets_one_trial_through_per_interval():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_open_circuit_fails_fast_with_degraded_response():
+    app = create_app(TestConfig)
+    client = app.test_client()
+    register(client)
+    login(client)
+    mongo_breaker.trip()
+    try:
+        with pytest.raises(ServerSelectionTimeoutError):
+            mongo.db
+
+        start = time.perf_counter()
+        resp = client.get("/patients/")
+        assert time.perf_counter() - start < 1
+        assert b"dummy data" in resp.data
+    finally:
+        mongo_breaker.reset()
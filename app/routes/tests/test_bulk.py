@@ -0,0 +1,45 @@
+import pytest
+from bson.objectid import ObjectId
+
+from app import create_app
+from app.bulk import BulkRequestError, parse_operations, run_bulk
+from app.routes.tests.test_app import TestConfig
+
+PATIENT = {
+    "gender": "Female", "age": 61.0, "hypertension": 0, "heart_disease": 1,
+    "ever_married": "Yes", "work_type": "Private", "residence_type": "Urban",
+    "avg_glucose_level": 120.5, "bmi": None, "smoking_status": "never smoked", "stroke": 0,
+}
+
+
+def test_parse_operations_rejects_non_lists_and_oversized_batches():
+    assert parse_operations({"operations": [{"op": "delete"}]}, 10) == [{"op": "delete"}]
+    with pytest.raises(BulkRequestError):
+        parse_operations({"op": "delete"}, 10)
+    with pytest.raises(BulkRequestError):
+        parse_operations([{}] * 3, 2)
+
+
+def test_run_bulk_validates_every_item_and_writes_once(fake_collection):
+    stored = {"_id": ObjectId(), "patient_id": 7, **PATIENT}
+    coll = fake_collection
+    coll.insert_many([stored])
+    operations = [
+        {"op": "create", "data": {**PATIENT, "patient_id": 8}},
+        {"op": "create", "data": {**PATIENT, "patient_id": 9, "age": 200}},
+        {"op": "update", "patient_id": 7, "data": {"stroke": 1}},
+        {"op": "delete", "patient_id": 42},
+        {"op": "delete", "patient_id": 7},
+    ]
+    with create_app(TestConfig).test_request_context():
+        results, removed, added, touched = run_bulk(coll, operations)
+
+    assert [r["status"] for r in results] == ["created", "invalid", "updated", "not_found", "invalid"]
+    assert "age" in results[1]["errors"]
+    assert len(coll.writes) == 1
+    ops, ordered = coll.writes[0]
+    assert len(ops) == 2 and ordered is False
+    assert removed == [stored] and touched == [stored["_id"]]
+    assert [d["patient_id"] for d in added] == [8, 7]
+    assert added[1]["stroke"] == 1 and "risk_score" in added[1]
+    assert coll.patient(7)["stroke"] == 1 and coll.patient(8) is not None
@@ -0,0 +1,45 @@
+from app.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+
+def test_counters_track_hits_misses_and_evictions():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=1, ttl=5, clock=clock)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    cache.set("b", 2)
+    clock.now = 5.0
+    cache.get("b")
+    assert cache.stats() == {
+        "hits": 1, "misses": 2, "evictions": 1, "expirations": 1, "entries": 0,
+    }
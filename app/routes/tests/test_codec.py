@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app import create_app
+from app.codec import CSV_HEADER, Patient, PatientError, decode, json_from_documents
+from app.export import csv_chunks, ndjson_chunks
+from app.forms import PatientForm
+from app.routes.tests.test_app import TestConfig, login, register
+
+ROW = {
+    "id": "9046", "gender": "Male", "age": "67", "hypertension": "0", "heart_disease": "1",
+    "ever_married": "Yes", "work_type": "Private", "Residence_type": "Urban",
+    "avg_glucose_level": "228.69", "bmi": "N/A", "smoking_status": "formerly smoked", "stroke": "1",
+}
+
+
+def test_row_document_csv_and_json_round_trip():
+    patient = Patient.from_row(ROW)
+    doc = patient.to_document()
+    assert doc["patient_id"] == 9046 and doc["age"] == 67.0 and doc["bmi"] is None
+    assert Patient.from_document({"_id": 1, **doc}) == patient
+    assert Patient.from_dict(json.loads(next(json_from_documents([doc])))) == patient
+
+    exported = "".join(csv_chunks([doc]))
+    (row,) = csv.DictReader(io.StringIO(exported))
+    assert tuple(row) == CSV_HEADER and Patient.from_row(row) == patient
+    assert json.loads("".join(ndjson_chunks([doc]))) == doc
+
+
+def test_every_path_applies_the_same_rules():
+    bad = {**ROW, "age": "200", "gender": "Robot", "stroke": "", "avg_glucose_level": "nan"}
+    with pytest.raises(PatientError) as e:
+        Patient.from_row(bad)
+    assert e.value.errors == {
+        "gender": ["Not a valid choice."],
+        "age": ["Number must be between 0 and 130."],
+        "avg_glucose_level": ["Not a valid float value."],
+        "stroke": ["This field is required."],
+    }
+    # JSON values are coerced but not truncated: 1.5 is not an integer
+    assert decode((1.0, "Male", 5, 1.5, 0, "No", "Private", "Rural", 80, None, None, 0))[1] == {
+        "hypertension": ["Not a valid integer value."]
+    }
+
+    # "N/A" is a missing value only where one is allowed
+    assert Patient.from_row({**ROW, "work_type": "N/A"}).work_type == "N/A"
+    assert Patient.from_row({**ROW, "smoking_status": "N/A"}).smoking_status is None
+
+    # integers stay exact, and must fit MongoDB's int64
+    assert Patient.from_row({**ROW, "id": "9007199254740993"}).patient_id == 9007199254740993
+    for big in ("9223372036854775808", "99999999999999999999", "9007199254740993.0"):
+        with pytest.raises(PatientError):
+            Patient.from_row({**ROW, "id": big})
+
+
+def test_fill_form_and_from_form():
+    with create_app(TestConfig).test_request_context():
+        form = Patient.from_row(ROW).fill_form(PatientForm())
+        assert form.age.data == 67.0 and form.stroke.data == 1
+        assert Patient.from_form(form) == Patient.from_row(ROW)
+
+
+def test_create_form_rejects_what_the_patient_rules_reject():
+    client = create_app(TestConfig).test_client()
+    register(client, "admin", "admin@example.com")
+    login(client, "admin")
+    data = {
+        "patient_id": "1", "gender": "Male", "age": "67", "hypertension": "0", "heart_disease": "1",
+        "ever_married": "Yes", "work_type": "Private", "residence_type": "Urban",
+        "avg_glucose_level": "100", "bmi": "", "smoking_status": "", "stroke": "0",
+    }
+    for field, value in (("bmi", "nan"), ("avg_glucose_level", "inf"), ("age", "-inf")):
+        resp = client.post("/patients/create", data={**data, field: value})
+        assert resp.status_code == 200
+        assert b"Not a valid float value." in resp.data
@@ -0,0 +1,38 @@
+from flask import flash
+
+from app import create_app
+from app.conditional import cacheable, not_modified, page_etag
+from app.routes.tests.test_app import TestConfig
+
+
+def test_matching_etag_returns_private_304():
+    app = create_app(TestConfig)
+    with app.test_request_context("/patients/?q=smok"):
+        etag = page_etag(7)
+    with app.test_request_context("/patients/?q=smok", headers={"If-None-Match": f'W/"{etag}"'}):
+        resp = not_modified(page_etag(7))
+        assert resp.status_code == 304
+        assert resp.headers["Cache-Control"] == "private, no-cache"
+        assert "Cookie" in resp.headers["Vary"]
+        # a bumped version no longer matches
+        assert not_modified(page_etag(8)) is None
+
+
+def test_etag_depends_on_query_string_and_validator():
+    app = create_app(TestConfig)
+    with app.test_request_context("/patients/?q=smok"):
+        first = page_etag(1)
+        assert page_etag(None) is None
+    with app.test_request_context("/patients/?q=male"):
+        assert page_etag(1) != first
+
+
+def test_pending_flash_disables_304():
+    app = create_app(TestConfig)
+    with app.test_request_context("/dashboard"):
+        etag = page_etag(3)
+    with app.test_request_context("/dashboard", headers={"If-None-Match": f'W/"{etag}"'}):
+        flash("Patient created successfully.", "success")
+        assert not_modified(etag) is None
+        resp = cacheable(app.response_class("page"), etag)
+        assert resp.headers["ETag"] == f'W/"{etag}"'
@@ -0,0 +1,31 @@
+import gzip
+import json
+
+from app.codec import CSV_HEADER
+from app.export import csv_chunks, gzip_chunks, ndjson_chunks
+
+DOCS = [
+    {"patient_id": 9046, "gender": "Male", "age": 67.0, "bmi": 36.6, "stroke": 1},
+    {"patient_id": 51676, "gender": "Female", "age": 61.0, "bmi": None, "stroke": 1},
+]
+
+
+def test_ndjson_has_one_object_per_line():
+    lines = "".join(ndjson_chunks(iter(DOCS))).splitlines()
+    assert [json.loads(line)["patient_id"] for line in lines] == [9046, 51676]
+
+
+def test_csv_uses_dataset_header_and_na_bmi():
+    lines = "".join(csv_chunks(iter(DOCS))).splitlines()
+    assert lines[0].startswith("id,gender,age,")
+    assert ",N/A," in lines[2]
+
+
+def test_empty_csv_export_still_has_the_header():
+    assert "".join(csv_chunks(iter([]))) == ",".join(CSV_HEADER) + "\n"
+
+
+def test_gzip_stream_round_trips():
+    text = "".join(ndjson_chunks(iter(DOCS)))
+    data = b"".join(gzip_chunks(ndjson_chunks(iter(DOCS))))
+    assert gzip.decompress(data).decode() == text
@@ -0,0 +1,50 @@
+from bson.objectid import ObjectId
+from werkzeug.datastructures import MultiDict
+
+from app.filters import build_filter_query, faceted_page, list_query, parse_filters
+from app.pagination import encode_cursor
+
+
+def test_filters_compile_to_ranges_and_equality_matches():
+    args = MultiDict([
+        ("age_min", "40"), ("age_max", "65"), ("glucose_min", "abc"), ("bmi_max", "30.5"),
+        ("hypertension", "1"), ("stroke", "maybe"),
+        ("smoking_status", "smokes"), ("smoking_status", "formerly smoked"), ("work_type", " "),
+    ])
+    filters = parse_filters(args)
+    assert filters == {
+        "age_min": 40.0, "age_max": 65.0, "bmi_max": 30.5, "hypertension": 1,
+        "smoking_status": ["formerly smoked", "smokes"],
+    }
+    assert build_filter_query(filters) == {
+        "age": {"$gte": 40.0, "$lte": 65.0},
+        "bmi": {"$lte": 30.5},
+        "hypertension": 1,
+        "smoking_status": {"$in": ["formerly smoked", "smokes"]},
+    }
+    # combined with the search box, without any regex on the filtered fields
+    assert list_query(MultiDict([("q", "42"), ("residence_type", "Rural")])) == {
+        "$and": [{"patient_id": 42}, {"residence_type": "Rural"}]
+    }
+
+
+def test_faceted_page_reads_page_total_and_facets_from_one_aggregation(fake_collection):
+    ids = [ObjectId() for _ in range(3)]
+    coll = fake_collection
+    coll.aggregate_results = [{
+        "page": [{"_id": oid} for oid in ids],
+        "total": [{"n": 7}],
+        "facet_smoking_status": [{"_id": "smokes", "n": 5}, {"_id": "Unknown", "n": 2}],
+        "facet_stroke": [{"_id": 1, "n": 7}],
+    }]
+    docs, next_cursor, prev_cursor, total, facets = faceted_page(coll, {"stroke": 1}, 2, after=ids[0])
+
+    assert len(coll.pipelines) == 1
+    match, facet = coll.pipelines[0]
+    assert match == {"$match": {"stroke": 1}}
+    assert facet["$facet"]["page"][0] == {"$match": {"_id": {"$gt": ids[0]}}}
+    assert [d["_id"] for d in docs] == ids[:2]
+    assert next_cursor == encode_cursor(ids[1]) and prev_cursor == encode_cursor(ids[0])
+    assert total == 7
+    assert facets["smoking_status"] == [("smokes", 5), ("Unknown", 2)]
+    assert facets["work_type"] == []
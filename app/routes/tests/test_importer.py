@@ -0,0 +1,75 @@
+from app.importer import import_csv
+
+
+HEADER = (
+    "id,gender,age,hypertension,heart_disease,ever_married,work_type,"
+    "Residence_type,avg_glucose_level,bmi,smoking_status,stroke\n"
+)
+GOOD = "9046,Male,67,0,1,Yes,Private,Urban,228.69,36.6,formerly smoked,1\n"
+NO_BMI = "51676,Female,61,0,0,Yes,Self-employed,Rural,202.21,N/A,never smoked,1\n"
+BAD_AGE = "31112,Male,old,0,1,Yes,Private,Rural,105.92,32.5,never smoked,1\n"
+OTHER = "1665,Female,79,1,0,Yes,Self-employed,Rural,174.12,24,never smoked,1\n"
+
+
+def test_import_upserts_unordered_batches(tmp_path, fake_collection):
+    path = tmp_path / "patients.csv"
+    path.write_text(HEADER + GOOD + NO_BMI + OTHER)
+    coll = fake_collection
+
+    summary = import_csv(coll, str(path), batch_size=2)
+
+    assert summary["inserted"] == 3
+    assert summary["batches"] == 2
+    assert [len(ops) for ops, _ in coll.writes] == [2, 1]
+    assert all(ordered is False for _, ordered in coll.writes)
+    assert coll.patient(51676)["bmi"] is None
+    assert coll.patient(51676)["content_hash"]
+
+
+def test_reimport_writes_only_changed_rows_and_keeps_edits(tmp_path, fake_collection):
+    path = tmp_path / "patients.csv"
+    path.write_text(HEADER + GOOD + NO_BMI + OTHER)
+    coll = fake_collection
+    import_csv(coll, str(path), batch_size=2)
+    coll.writes.clear()
+    coll.patient(1665)["work_type"] = "Govt_job"  # an edit made in the app
+
+    path.write_text(HEADER + GOOD + NO_BMI.replace("202.21", "99.5") + OTHER)
+    changes = []
+    summary = import_csv(coll, str(path), batch_size=2, on_batch=lambda r, a: changes.append((r, a)))
+
+    assert (summary["inserted"], summary["updated"], summary["unchanged"]) == (0, 1, 2)
+    assert len(coll.writes) == 1
+    assert coll.patient(51676)["avg_glucose_level"] == 99.5
+    assert coll.patient(1665)["work_type"] == "Govt_job"
+    (removed, added), = changes
+    assert removed[0]["patient_id"] == 51676 and added[0]["avg_glucose_level"] == 99.5
+
+
+def test_prune_deletes_patients_missing_from_the_file(tmp_path, fake_collection):
+    path = tmp_path / "patients.csv"
+    path.write_text(HEADER + GOOD + NO_BMI)
+    coll = fake_collection
+    import_csv(coll, str(path))
+
+    path.write_text(HEADER + GOOD)
+    summary = import_csv(coll, str(path), prune=True)
+
+    assert summary["pruned"] and summary["deleted"] == 1
+    assert [d["patient_id"] for d in coll.docs] == [9046]
+
+
+def test_import_reports_bad_and_duplicate_rows_per_batch(tmp_path, fake_collection):
+    path = tmp_path / "patients.csv"
+    path.write_text(HEADER + GOOD + BAD_AGE + GOOD)
+    coll = fake_collection
+
+    summary = import_csv(coll, str(path), batch_size=2, prune=True)
+
+    assert summary["inserted"] == 1
+    assert summary["rejected"] == 2
+    assert summary["pruned"] is False
+    failed = summary["failed_batches"]
+    assert [b["batch"] for b in failed] == [1, 2]
+    assert failed[0]["errors"][0]["row"] == 3
+    assert "duplicate" in failed[1]["errors"][0]["error"]
@@ -0,0 +1,17 @@
+from app.indexes import REQUIRED_INDEXES, _plan_stages
+
+
+def test_patient_id_index_is_unique():
+    specs = {m.document["name"]: m.document for m in REQUIRED_INDEXES["patients"]}
+    assert specs["patient_id_unique"]["unique"] is True
+
+
+def test_plan_stages_walks_nested_plans():
+    plan = {
+        "stage": "LIMIT",
+        "inputStage": {
+            "stage": "FETCH",
+            "inputStage": {"stage": "IXSCAN", "indexName": "stroke_glucose"},
+        },
+    }
+    assert list(_plan_stages(plan)) == ["LIMIT", "FETCH", "IXSCAN"]
@@ -0,0 +1,84 @@
+import csv
+
+import pytest
+
+from app.codec import Patient, PatientError
+from app.ingest import CSVHeaderError, ingest_csv
+from app.routes.tests.test_importer import BAD_AGE, GOOD, HEADER, NO_BMI, OTHER
+
+MESSY = "2,Robot, 200 ,2,1.5,Yes,Private,Urban,nan, N/A ,,\n"
+SHORT = "3,Male,5\n"
+BLANK = ",,,,,,,,,,,\n"
+# ids a float64 cannot hold exactly, or an int64 cannot hold at all
+BIG_IDS = (
+    "9007199254740993", "9223372036854775807", "-9223372036854775808", " 42 ", "7.0",
+    "9223372036854775808", "99999999999999999999", "9007199254740993.0", "1.5", "0x10",
+)
+
+
+def codec_results(path):
+    """(row number, document or error) per data row, the way Patient.from_row sees them."""
+    results = []
+    with open(path, newline="") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                results.append((line, Patient.from_row(row).to_document()))
+            except PatientError as e:
+                results.append((line, str(e)))
+    return results
+
+
+def ingest_results(blocks):
+    results = [(line, doc) for b in blocks for doc, line in zip(b.docs, b.lines)]
+    results += [(r["row"], r["error"]) for b in blocks for r in b.rejects]
+    return sorted(results, key=lambda r: r[0])
+
+
+def test_blocks_match_the_row_codec(tmp_path):
+    path = tmp_path / "patients.csv"
+    path.write_text(HEADER + GOOD + NO_BMI + BAD_AGE + OTHER + MESSY + GOOD.replace("Private", "N/A"))
+
+    blocks = list(ingest_csv(str(path), block_rows=2))
+
+    assert [(b.first_line, b.last_line, b.size) for b in blocks] == [(2, 3, 2), (4, 5, 2), (6, 7, 2)]
+    assert ingest_results(blocks) == codec_results(path)
+    assert type(blocks[0].docs[0]["patient_id"]) is int and blocks[0].docs[1]["bmi"] is None
+
+
+def test_integers_are_parsed_exactly_and_checked_against_int64(tmp_path):
+    path = tmp_path / "patients.csv"
+    path.write_text(HEADER + "".join(GOOD.replace("9046", big, 1) for big in BIG_IDS))
+
+    (block,) = ingest_csv(str(path))
+
+    results = ingest_results([block])
+    assert repr(results) == repr(codec_results(path))
+    assert [doc["patient_id"] for doc in block.docs] == [
+        9007199254740993, 2 ** 63 - 1, -(2 ** 63), 42, 7,
+    ]
+    assert [r["row"] for r in block.rejects] == [7, 8, 9, 10, 11]
+    assert all(r["fields"] == {"patient_id": ["Not a valid integer value."]} for r in block.rejects)
+
+
+def test_reject_report_names_rows_and_fields(tmp_path):
+    path = tmp_path / "patients.csv"
+    path.write_text(HEADER + GOOD + MESSY + SHORT + BLANK)
+
+    (block,) = ingest_csv(str(path))
+
+    assert block.lines == [2]
+    assert [r["row"] for r in block.rejects] == [3, 4, 5]
+    assert block.rejects[0]["fields"] == {
+        "gender": ["Not a valid choice."],
+        "age": ["Number must be between 0 and 130."],
+        "hypertension": ["Not a valid choice."],
+        "heart_disease": ["Not a valid integer value."],
+        "avg_glucose_level": ["Not a valid float value."],
+        "stroke": ["This field is required."],
+    }
+    assert block.rejects[1]["error"] == "expected 12 fields, found 3"
+    assert "bmi" not in block.rejects[2]["fields"] and len(block.rejects[2]["fields"]) == 10
+
+    path.write_text("id,gender\n1,Male\n")
+    with pytest.raises(CSVHeaderError):
+        list(ingest_csv(str(path)))
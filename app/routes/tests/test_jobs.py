@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+from flask import current_app
+
+from app import create_app
+from app.jobs import CANCELLED, SUCCEEDED, JobConflict, JobQueueFull, JobRunner
+from app.routes.tests.test_app import TestConfig, login, register
+
+
+def make_runner(workers=1, queued=1):
+    runner = JobRunner()
+    app = create_app(TestConfig)
+    app.config.update(JOB_WORKERS=workers, JOB_QUEUE_LIMIT=queued)
+    runner.init_app(app)
+    return runner
+
+
+def test_job_reports_progress_and_result_in_an_app_context():
+    runner = make_runner()
+
+    def task(job, n):
+        for i in range(n):
+            job.report(i + 1, n)
+        return current_app.config["JOB_WORKERS"]
+
+    job = runner.submit("count", task, 3)
+    job.future.result(timeout=5)
+    status = runner.get(job.id).to_dict()
+    assert status["status"] == SUCCEEDED
+    assert status["progress"] == 1.0 and status["result"] == 1
+
+
+def test_queue_limit_exclusive_kinds_and_cancellation():
+    runner = make_runner(workers=1, queued=1)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking(job):
+        started.set()
+        while not release.wait(0.01):
+            job.report(0)
+
+    running = runner.submit("rescore", blocking, exclusive=True)
+    started.wait(5)
+    with pytest.raises(JobConflict):
+        runner.submit("rescore", blocking, exclusive=True)
+    queued = runner.submit("export", blocking)
+    with pytest.raises(JobQueueFull):
+        runner.submit("export", blocking)
+
+    # a queued job never starts; a running one stops at its next report
+    runner.cancel(queued.id)
+    assert queued.status == CANCELLED
+    runner.cancel(running.id)
+    running.future.result(timeout=5)
+    assert running.status == CANCELLED
+    release.set()
+
+
+def test_status_endpoint_only_shows_own_jobs():
+    client = create_app(TestConfig).test_client()
+    register(client, "admin", "admin@example.com")  # the first user is an admin
+    register(client)
+    login(client)
+    from app.jobs import jobs
+
+    mine = jobs.submit("noop", lambda job: "done", owner="2")
+    theirs = jobs.submit("noop", lambda job: "done", owner="1")
+    mine.future.result(timeout=5)
+
+    resp = client.get(f"/jobs/{mine.id}")
+    assert resp.status_code == 200 and resp.get_json()["result"] == "done"
+    assert client.get(f"/jobs/{theirs.id}").status_code == 404
+    assert client.get("/jobs/missing").status_code == 404
+
+
+def test_dropping_a_finished_job_deletes_its_files(tmp_path):
+    runner = make_runner()
+    runner.keep = 1
+
+    def export(job, name):
+        path = tmp_path / name
+        path.write_text("id\n")
+        job.files.append(str(path))
+
+    first = runner.submit("export", export, "first.csv")
+    first.future.result(timeout=5)
+    second = runner.submit("export", export, "second.csv")
+    second.future.result(timeout=5)
+    runner.submit("export", export, "third.csv").future.result(timeout=5)
+
+    assert runner.get(first.id) is None
+    assert not (tmp_path / "first.csv").exists()
+    assert (tmp_path / "second.csv").exists()
+
+
+def test_rescore_rejects_a_non_positive_batch_size():
+    client = create_app(TestConfig).test_client()
+    register(client, "admin", "admin@example.com")
+    login(client, "admin")
+    assert client.post("/jobs/rescore?batch_size=0").status_code == 400
+    assert client.post("/jobs/rescore?batch_size=-5").status_code == 400
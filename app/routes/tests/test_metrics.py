@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from app import create_app, metrics
+from app.routes.tests.test_app import TestConfig, register
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = metrics.Histogram("demo_seconds", "Demo.", ("endpoint",), buckets=(0.1, 1.0))
+    hist.observe(("a",), 0.05)
+    hist.observe(("a",), 0.5)
+    hist.observe(("a",), 3.0)
+    lines = list(hist.samples())
+    assert 'demo_seconds_bucket{endpoint="a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{endpoint="a",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{endpoint="a",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{endpoint="a"} 3' in lines
+
+
+def test_mongo_listener_records_command_and_collection():
+    metrics.reset()
+    listener = metrics.MongoCommandListener()
+    started = SimpleNamespace(
+        command_name="find", command={"find": "patients"}, connection_id=("h", 1), request_id=7,
+    )
+    listener.started(started)
+    listener.succeeded(SimpleNamespace(
+        command_name="find", connection_id=("h", 1), request_id=7, duration_micros=2500,
+    ))
+    assert metrics.MONGO_COMMAND_LATENCY.count(("find", "patients")) == 1
+
+
+def test_metrics_endpoint_reports_requests_and_sql():
+    metrics.reset()
+    client = create_app(TestConfig).test_client()
+    register(client)
+    client.get("/")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+    body = resp.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="main.index",method="GET"} 1' in body
+    assert 'http_requests_total{endpoint="auth.register",method="POST",status="302"} 1' in body
+    assert 'sqlalchemy_query_duration_seconds_count{statement="INSERT"}' in body
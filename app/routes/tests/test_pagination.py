@@ -0,0 +1,16 @@
+from bson.objectid import ObjectId
+
+from app.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    token = encode_cursor(oid)
+    assert "=" not in token
+    assert decode_cursor(token) == oid
+
+
+def test_malformed_cursor_is_ignored():
+    assert decode_cursor(None) is None
+    assert decode_cursor("not-a-cursor!") is None
+    assert decode_cursor("YWJj") is None
@@ -0,0 +1,23 @@
+from bson.objectid import ObjectId
+
+from app.patient_cache import get_patient, invalidate_patient, patient_cache
+
+
+def test_repeated_reads_are_served_from_the_cache(fake_db):
+    oid = ObjectId()
+    fake_db.patients.insert_many([{"_id": oid, "patient_id": 1, "age": 50.0}])
+
+    assert get_patient(str(oid))["patient_id"] == 1
+    assert get_patient(oid)["patient_id"] == 1
+    assert fake_db.patients.reads == 1
+    assert patient_cache.stats()["hits"] == 1
+
+    invalidate_patient(str(oid))
+    get_patient(oid)
+    assert fake_db.patients.reads == 2
+
+
+def test_invalid_or_unknown_ids_are_not_cached(fake_db):
+    assert get_patient("not-an-id") is None
+    assert get_patient(ObjectId()) is None
+    assert len(patient_cache) == 0
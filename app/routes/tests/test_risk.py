@@ -0,0 +1,43 @@
+from bson.objectid import ObjectId
+
+from app.patient_cache import patient_cache
+from app.risk import rescore_collection, risk_bands, score_documents
+
+OLDER = {"age": 78.0, "hypertension": 1, "heart_disease": 1, "avg_glucose_level": 220.0,
+         "bmi": 33.0, "smoking_status": "smokes"}
+YOUNGER = {"age": 25.0, "hypertension": 0, "heart_disease": 0, "avg_glucose_level": 85.0,
+           "bmi": None, "smoking_status": "never smoked"}
+
+
+def test_batch_scores_rank_risk_factors():
+    older, younger = score_documents([OLDER, YOUNGER])
+    assert 0.0 < younger["risk_score"] < older["risk_score"] < 1.0
+    assert younger["risk_band"] == "low"
+    assert older["risk_band"] == "high"
+
+
+def test_missing_values_are_filled_not_rejected():
+    [scored] = score_documents([{"age": None}])
+    assert 0.0 < scored["risk_score"] < 0.05
+
+
+def test_band_edges():
+    assert risk_bands([0.0, 0.049, 0.05, 0.149, 0.15]).tolist() == [
+        "low", "low", "medium", "medium", "high",
+    ]
+
+
+def test_rescore_stamps_updated_at_and_drops_cached_patients(fake_db):
+    stale = {"_id": ObjectId(), **OLDER, "risk_score": 0.0, "risk_band": "low"}
+    current = {"_id": ObjectId(), **YOUNGER, **score_documents([YOUNGER])[0]}
+    fake_db.patients.insert_many([stale, current])
+    patient_cache.set(stale["_id"], dict(stale))
+    patient_cache.set(current["_id"], dict(current))
+
+    assert rescore_collection(fake_db.patients) == 1
+
+    rescored = fake_db.patients.docs[0]
+    assert rescored["risk_band"] == "high" and rescored["updated_at"] is not None
+    assert "updated_at" not in fake_db.patients.docs[1]
+    assert patient_cache.get(stale["_id"]) is None
+    assert patient_cache.get(current["_id"]) is not None
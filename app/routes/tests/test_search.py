@@ -0,0 +1,21 @@
+from app.search import build_search_query, search_tokens, tokenize
+
+
+def test_tokens_are_lower_cased_words():
+    doc = {"gender": "Female", "smoking_status": "never smoked", "work_type": "Self-employed"}
+    assert tokenize("Govt_job") == ["govt", "job"]
+    assert search_tokens(doc) == ["employed", "female", "never", "self", "smoked"]
+
+
+def test_numeric_search_is_exact_patient_id():
+    assert build_search_query("9046") == {"patient_id": 9046}
+
+
+def test_text_search_is_anchored_and_escaped():
+    assert build_search_query("Smok") == {"search_tokens": {"$regex": "^smok"}}
+    assert build_search_query("never smo") == {"$and": [
+        {"search_tokens": {"$regex": "^never"}},
+        {"search_tokens": {"$regex": "^smo"}},
+    ]}
+    # regex metacharacters never reach MongoDB
+    assert build_search_query("(.*") == {"search_tokens": {"$in": []}}
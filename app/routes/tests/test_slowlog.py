@@ -0,0 +1,45 @@
+from bson.regex import Regex
+
+from app.slowlog import SlowQueryListener, query_shape, summarize_explain
+
+
+def test_query_shape_hides_literals_but_keeps_operators():
+    first = query_shape("find", {
+        "find": "patients",
+        "filter": {"search_tokens": {"$regex": Regex("^smok")}, "age": {"$in": [1, 2, 3]}},
+        "sort": {"_id": 1},
+        "limit": 51,
+        "lsid": {"id": "x"},
+    })
+    second = query_shape("find", {
+        "find": "patients",
+        "filter": {"search_tokens": {"$regex": Regex("^male")}, "age": {"$in": [9]}},
+        "sort": {"_id": 1},
+        "limit": 11,
+    })
+    assert first == second
+    assert first.startswith("find patients ")
+    assert '"$regex": "?"' in first
+
+
+def test_summarize_explain_flags_collection_scans():
+    plan = {
+        "queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}},
+        "executionStats": {"nReturned": 2, "totalDocsExamined": 5110, "totalKeysExamined": 0},
+    }
+    summary = summarize_explain(plan)
+    assert summary["collscan"] is True
+    assert summary["examined_per_returned"] == 2555.0
+
+
+def test_slow_queries_are_aggregated_by_shape():
+    listener = SlowQueryListener(threshold_ms=10, explain=False)
+    for value in ("Male", "Female"):
+        command = {"find": "patients", "filter": {"gender": value}}
+        listener.record("find", command, "patient_app", "patients.list_patients", 25.0)
+
+    shapes = listener.slow_queries()
+    assert len(shapes) == 1
+    assert shapes[0]["count"] == 2
+    assert shapes[0]["total_ms"] == 50.0
+    assert shapes[0]["endpoints"] == ["patients.list_patients"]
@@ -0,0 +1,62 @@
+from collections import defaultdict
+
+from app.stats import _accumulate, age_band_index, build_pipeline, dashboard_context
+
+
+def test_dashboard_is_a_single_facet_stage():
+    pipeline = build_pipeline()
+    assert len(pipeline) == 1
+    assert set(pipeline[0]["$facet"]) == {
+        "totals", "genders", "age_bands", "risk_bands", "high_risk",
+    }
+
+
+def test_dashboard_context_from_raw_stats():
+    stats = {
+        "total": 4,
+        "stroke_yes": 1,
+        "stroke_no": 3,
+        "genders": {"Male": 3, "Female": 1},
+        "age_bands": [1, 0, 2, 1, 0],
+        "sum_age": 170.0, "n_age": 4,
+        "sum_glucose": 0, "n_glucose": 0,
+        "sum_bmi": 57.0, "n_bmi": 2,
+        "high_risk": [],
+    }
+
+    ctx = dashboard_context(stats)
+
+    assert ctx["stroke_rate"] == 25.0
+    assert ctx["gender_counts"] == [3, 1, 0]
+    assert ctx["avg_age"] == 42.5
+    assert ctx["avg_glucose"] is None
+    assert ctx["avg_bmi"] == 28.5
+    assert ctx["age_band_counts"] == [1, 0, 2, 1, 0]
+
+
+def test_age_band_index_matches_inclusive_bounds():
+    assert age_band_index(0) == 0
+    assert age_band_index(20) == 0
+    assert age_band_index(20.5) == 1
+    assert age_band_index(80) == 3
+    assert age_band_index(81) == 4
+    assert age_band_index(None) is None
+
+
+def test_edit_delta_moves_counts_between_buckets():
+    old = {"stroke": 0, "gender": "Male", "age": 30.0, "bmi": None, "avg_glucose_level": 100.0}
+    new = {"stroke": 1, "gender": "Female", "age": 30.0, "bmi": 25.0, "avg_glucose_level": 100.0}
+    inc = defaultdict(int)
+
+    _accumulate(inc, old, -1)
+    _accumulate(inc, new, 1)
+
+    changed = {k: v for k, v in inc.items() if v}
+    assert changed == {
+        "stroke_no": -1,
+        "stroke_yes": 1,
+        "genders.Male": -1,
+        "genders.Female": 1,
+        "sum_bmi": 25.0,
+        "n_bmi": 1,
+    }
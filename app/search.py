@@ -0,0 +1,47 @@
+"""
+Free-text patient search backed by a multikey index.
+
+Every patient document stores ``search_tokens``: the lower-cased words of
+its gender, smoking_status and work_type. A search term is tokenized the
+same way and each word becomes an anchored prefix regex on that field,
+which MongoDB answers with a bounded scan of the search_tokens index.
+"""
+import re
+
+SEARCH_FIELDS = ("gender", "smoking_status", "work_type")
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def tokenize(text):
+    """'Self-employed' -> ['self', 'employed']"""
+    return [t for t in _NON_WORD.split(str(text).lower()) if t]
+
+
+def search_tokens(doc):
+    """Sorted, de-duplicated search tokens for a patient document."""
+    tokens = set()
+    for field in SEARCH_FIELDS:
+        value = doc.get(field)
+        if value:
+            tokens.update(tokenize(value))
+    return sorted(tokens)
+
+
+def build_search_query(q):
+    """
+    MongoDB filter for the search box: an integer is an exact patient_id,
+    anything else must prefix-match every word against search_tokens.
+    """
+    try:
+        return {"patient_id": int(q)}
+    except ValueError:
+        pass
+
+    words = tokenize(q)
+    if not words:
+        # only punctuation: nothing can match
+        return {"search_tokens": {"$in": []}}
+
+    clauses = [{"search_tokens": {"$regex": "^" + re.escape(w)}} for w in words]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
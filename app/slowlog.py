@@ -0,0 +1,217 @@
+"""
+Slow MongoDB query log.
+
+``SlowQueryListener`` is a pymongo CommandListener. Any command slower than
+SLOW_QUERY_MS is logged with the endpoint that issued it, its normalized
+query shape (literal values replaced by "?") and its duration. Its
+``explain("executionStats")`` is captured on a background thread, which
+adds the plan stages, whether it was a COLLSCAN, and the ratio of
+documents examined to documents returned.
+
+Entries are aggregated by shape (``slow_queries``), so repeated
+count_documents or $regex scans show up as one line with a count and a
+total time. The aggregate is served as JSON at /slow-queries.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import has_request_context, request
+from pymongo import monitoring
+
+from app import mongo
+from app.indexes import _plan_stages
+
+log = logging.getLogger(__name__)
+
+# commands that carry a query and can be explained; getMore is part of the
+# command that opened the cursor
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# fields of a command that describe its query
+SHAPE_FIELDS = ("filter", "query", "sort", "projection", "fields", "pipeline", "key", "updates", "deletes")
+# command fields that explain() rejects
+SESSION_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction"}
+
+# the same shape is explained at most once per interval
+EXPLAIN_INTERVAL = 60.0
+RECENT_ENTRIES = 100
+
+
+def normalize(value):
+    """Replace literal values with "?"; keep field names and operators."""
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [normalize(v) for v in value]
+        # {"$in": [1, 2, 3]} and {"$in": [4]} share a shape
+        return items[:1] if all(i == "?" for i in items) else items
+    return "?"
+
+
+def query_shape(command_name, command):
+    """Stable string for a command's query, e.g. 'find patients {"filter": ...}'."""
+    collection = command.get(command_name)
+    parts = {}
+    for field in SHAPE_FIELDS:
+        if field not in command:
+            continue
+        value = command[field]
+        if field in ("sort", "projection", "fields"):
+            parts[field] = dict(value) if isinstance(value, dict) else value
+        elif field in ("updates", "deletes"):
+            parts[field] = normalize([{"q": op.get("q")} for op in value])
+        else:
+            parts[field] = normalize(value)
+    return f"{command_name} {collection} {json.dumps(parts, sort_keys=True, default=str)}"
+
+
+def _find(doc, key):
+    """First value stored under key anywhere in a nested explain document."""
+    if isinstance(doc, dict):
+        if key in doc:
+            return doc[key]
+        children = doc.values()
+    elif isinstance(doc, list):
+        children = doc
+    else:
+        return None
+    for child in children:
+        found = _find(child, key)
+        if found is not None:
+            return found
+    return None
+
+
+def summarize_explain(plan):
+    """The interesting numbers of an explain("executionStats") result."""
+    winning = _find(plan, "winningPlan") or {}
+    stages = list(_plan_stages(winning))
+    stats = _find(plan, "executionStats") or {}
+    examined = stats.get("totalDocsExamined")
+    returned = stats.get("nReturned")
+    return {
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": examined,
+        "returned": returned,
+        # 1.0 is ideal; a COLLSCAN for one row is the collection size
+        "examined_per_returned": (
+            round(examined / max(returned, 1), 2) if examined is not None and returned is not None else None
+        ),
+    }
+
+
+def explain_command(command_name, command, database):
+    """Run explain("executionStats") for a captured command."""
+    inner = {k: v for k, v in command.items() if not k.startswith("$") and k not in SESSION_FIELDS}
+    return mongo.cx[database].command("explain", inner, verbosity="executionStats")
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Records commands slower than threshold_ms; explains them if explain is set."""
+
+    def __init__(self, threshold_ms=100.0, explain=True):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self._pending = {}  # (connection, request_id) -> (command, endpoint)
+        self._shapes = {}   # shape -> aggregate dict
+        self._recent = deque(maxlen=RECENT_ENTRIES)
+        self._explained_at = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def configure(self, threshold_ms, explain=True):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+
+    @staticmethod
+    def _key(event):
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE:
+            endpoint = request.endpoint if has_request_context() else None
+            self._pending[self._key(event)] = (event.command, endpoint)
+
+    def succeeded(self, event):
+        pending = self._pending.pop(self._key(event), None)
+        if pending is not None and event.duration_micros >= self.threshold_ms * 1000:
+            command, endpoint = pending
+            self.record(event.command_name, command, event.database_name,
+                        endpoint, event.duration_micros / 1000)
+
+    def failed(self, event):
+        self._pending.pop(self._key(event), None)
+
+    # ---------- recording ----------
+
+    def record(self, command_name, command, database, endpoint, duration_ms):
+        shape = query_shape(command_name, command)
+        entry = {
+            "shape": shape,
+            "endpoint": endpoint,
+            "duration_ms": round(duration_ms, 2),
+            "at": time.time(),
+        }
+        with self._lock:
+            agg = self._shapes.get(shape)
+            if agg is None:
+                agg = self._shapes[shape] = {
+                    "shape": shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "endpoints": [], "plan": None,
+                }
+            agg["count"] += 1
+            agg["total_ms"] = round(agg["total_ms"] + duration_ms, 2)
+            agg["max_ms"] = max(agg["max_ms"], entry["duration_ms"])
+            if endpoint and endpoint not in agg["endpoints"]:
+                agg["endpoints"].append(endpoint)
+            self._recent.append(entry)
+            now = time.monotonic()
+            due = now - self._explained_at.get(shape, -EXPLAIN_INTERVAL) >= EXPLAIN_INTERVAL
+            if self.explain and due:
+                self._explained_at[shape] = now
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-explain")
+                self._executor.submit(self._explain, command_name, command, database, entry, agg)
+                return
+        log.warning("Slow MongoDB %s (%.1f ms) from %s: %s", command_name, duration_ms, endpoint, shape)
+
+    def _explain(self, command_name, command, database, entry, agg):
+        try:
+            plan = summarize_explain(explain_command(command_name, command, database))
+        except Exception as e:  # the query itself already succeeded
+            log.warning("Slow MongoDB %s (%.1f ms) from %s: %s (explain failed: %s)",
+                        command_name, entry["duration_ms"], entry["endpoint"], entry["shape"], e)
+            return
+        with self._lock:
+            entry["plan"] = agg["plan"] = plan
+        log.warning(
+            "Slow MongoDB %s (%.1f ms) from %s: %s plan=%s examined/returned=%s",
+            command_name, entry["duration_ms"], entry["endpoint"], entry["shape"],
+            ">".join(plan["stages"]), plan["examined_per_returned"],
+        )
+
+    # ---------- reading ----------
+
+    def slow_queries(self):
+        """Aggregates by shape, slowest total first."""
+        with self._lock:
+            shapes = [dict(agg, endpoints=list(agg["endpoints"])) for agg in self._shapes.values()]
+        return sorted(shapes, key=lambda agg: agg["total_ms"], reverse=True)
+
+    def recent(self):
+        with self._lock:
+            return list(self._recent)
+
+    def clear(self):
+        with self._lock:
+            self._shapes.clear()
+            self._recent.clear()
+            self._explained_at.clear()
+
+
+listener = SlowQueryListener()
@@ -0,0 +1,391 @@
+"""
+Dashboard statistics for the MongoDB 'patients' collection.
+
+All dashboard tiles can be computed by one aggregation: a single $facet
+stage runs the totals, gender split, age bands, risk bands and high-risk
+list side by side. The result is materialized in the 'dashboard_stats'
+collection and kept current with deltas from every write path, so a
+dashboard hit only reads that one document. ``rebuild_stats`` recomputes it from scratch.
+
+The document also carries a ``version`` that every write bumps, which the
+patient list and dashboard use as their ETag validator (app/conditional.py).
+"""
+import logging
+import time
+from collections import defaultdict
+
+from pymongo.errors import PyMongoError
+
+from app import mongo
+from app.risk import RISK_BAND_NAMES
+
+log = logging.getLogger(__name__)
+
+STATS_ID = "patients"
+
+GENDERS = ["Male", "Female", "Other"]
+
+# (label, upper bound inclusive); the last band is open ended
+AGE_BANDS = [("0–20", 20), ("21–40", 40), ("41–60", 60), ("61–80", 80), ("81+", None)]
+
+HIGH_RISK_LIMIT = 10
+
+# numeric fields averaged on the dashboard: stats key -> document field
+AVERAGED_FIELDS = {"age": "age", "glucose": "avg_glucose_level", "bmi": "bmi"}
+
+# Fields rendered in the high-risk table. Every one of them is a key of the
+# stroke_glucose_covering index, so the top-list query is index-only.
+HIGH_RISK_PROJECTION = {
+    "_id": 0,
+    "patient_id": 1,
+    "age": 1,
+    "avg_glucose_level": 1,
+    "bmi": 1,
+}
+
+# Highest predicted risk (app/risk.py): served by the risk_score_covering index
+AT_RISK_LIMIT = 10
+AT_RISK_PROJECTION = {"_id": 0, "patient_id": 1, "age": 1, "risk_score": 1}
+
+# Fields a patient contributes to the statistics (see _accumulate)
+STATS_PROJECTION = {
+    "stroke": 1, "gender": 1, "age": 1, "avg_glucose_level": 1, "bmi": 1, "risk_band": 1,
+}
+
+
+def _stats_coll():
+    return mongo.db.dashboard_stats
+
+
+def _is_num(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def age_band_index(age):
+    """Python twin of _age_band_expr; None for missing or negative ages."""
+    if not _is_num(age) or age < 0:
+        return None
+    for i, (_, upper) in enumerate(AGE_BANDS):
+        if upper is not None and age <= upper:
+            return i
+    return len(AGE_BANDS) - 1
+
+
+def high_risk_entry(doc):
+    """The subset of a patient document kept in the high-risk list."""
+    return {
+        "patient_id": doc.get("patient_id"),
+        "age": doc.get("age"),
+        "avg_glucose_level": doc.get("avg_glucose_level"),
+        "bmi": doc.get("bmi"),
+    }
+
+
+def _age_band_expr():
+    """$switch expression mapping $age to its band index."""
+    branches = [
+        {"case": {"$lte": ["$age", upper]}, "then": i}
+        for i, (_, upper) in enumerate(AGE_BANDS)
+        if upper is not None
+    ]
+    return {"$switch": {"branches": branches, "default": len(AGE_BANDS) - 1}}
+
+
+def _is_number(field):
+    # BSON order is null < numbers < strings, so this matches numbers only
+    return {"$and": [{"$gt": [f"${field}", None]}, {"$lt": [f"${field}", ""]}]}
+
+
+def build_pipeline():
+    """The single-pass $facet pipeline behind the dashboard."""
+    totals = {"_id": None, "total": {"$sum": 1}}
+    totals["stroke_yes"] = {"$sum": {"$cond": [{"$eq": ["$stroke", 1]}, 1, 0]}}
+    totals["stroke_no"] = {"$sum": {"$cond": [{"$eq": ["$stroke", 0]}, 1, 0]}}
+    for key, field in AVERAGED_FIELDS.items():
+        totals[f"sum_{key}"] = {"$sum": f"${field}"}
+        totals[f"n_{key}"] = {"$sum": {"$cond": [_is_number(field), 1, 0]}}
+
+    return [
+        {"$facet": {
+            "totals": [{"$group": totals}],
+            "genders": [
+                {"$match": {"gender": {"$in": GENDERS}}},
+                {"$group": {"_id": "$gender", "count": {"$sum": 1}}},
+            ],
+            "age_bands": [
+                # only numeric ages >= 0, like the old range counts
+                {"$match": {"age": {"$gte": 0}}},
+                {"$group": {"_id": _age_band_expr(), "count": {"$sum": 1}}},
+            ],
+            "risk_bands": [
+                {"$match": {"risk_band": {"$in": RISK_BAND_NAMES}}},
+                {"$group": {"_id": "$risk_band", "count": {"$sum": 1}}},
+            ],
+            "high_risk": [
+                {"$match": {"stroke": 1}},
+                {"$sort": {"avg_glucose_level": -1}},
+                {"$limit": HIGH_RISK_LIMIT},
+                {"$project": HIGH_RISK_PROJECTION},
+            ],
+        }}
+    ]
+
+
+def compute_stats(coll):
+    """
+    Run the dashboard pipeline against coll and return the raw statistics:
+    counts, per-field sums for the averages, and the high-risk list.
+    """
+    facets = next(coll.aggregate(build_pipeline()), {})
+
+    totals = (facets.get("totals") or [{}])[0]
+    stats = {
+        "total": totals.get("total", 0),
+        "stroke_yes": totals.get("stroke_yes", 0),
+        "stroke_no": totals.get("stroke_no", 0),
+        "genders": {g: 0 for g in GENDERS},
+        "age_bands": [0] * len(AGE_BANDS),
+        "risk_bands": {b: 0 for b in RISK_BAND_NAMES},
+        "high_risk": [high_risk_entry(d) for d in facets.get("high_risk", [])],
+    }
+    for key in AVERAGED_FIELDS:
+        stats[f"sum_{key}"] = totals.get(f"sum_{key}", 0)
+        stats[f"n_{key}"] = totals.get(f"n_{key}", 0)
+    for row in facets.get("genders", []):
+        stats["genders"][row["_id"]] = row["count"]
+    for row in facets.get("age_bands", []):
+        stats["age_bands"][row["_id"]] = row["count"]
+    for row in facets.get("risk_bands", []):
+        stats["risk_bands"][row["_id"]] = row["count"]
+    return stats
+
+
+# ---------- MATERIALIZED STATISTICS ----------
+
+def _to_document(stats):
+    """Raw statistics -> stored document (nested maps so $inc can address them)."""
+    doc = dict(stats)
+    doc["_id"] = STATS_ID
+    # a new epoch, so a rebuilt document never reuses an old version
+    doc["version"] = time.time_ns()
+    doc["genders"] = dict(stats["genders"])
+    doc["age_bands"] = {str(i): n for i, n in enumerate(stats["age_bands"])}
+    doc["risk_bands"] = dict(stats["risk_bands"])
+    return doc
+
+
+def _from_document(doc):
+    """Stored document -> raw statistics in the shape compute_stats returns."""
+    stats = {k: v for k, v in doc.items() if k != "_id"}
+    stats["genders"] = {g: doc.get("genders", {}).get(g, 0) for g in GENDERS}
+    bands = doc.get("age_bands", {})
+    stats["age_bands"] = [bands.get(str(i), 0) for i in range(len(AGE_BANDS))]
+    stats["risk_bands"] = {b: doc.get("risk_bands", {}).get(b, 0) for b in RISK_BAND_NAMES}
+    return stats
+
+
+def empty_stats():
+    stats = {
+        "total": 0,
+        "stroke_yes": 0,
+        "stroke_no": 0,
+        "genders": {g: 0 for g in GENDERS},
+        "age_bands": [0] * len(AGE_BANDS),
+        "risk_bands": {b: 0 for b in RISK_BAND_NAMES},
+        "high_risk": [],
+    }
+    for key in AVERAGED_FIELDS:
+        stats[f"sum_{key}"] = 0
+        stats[f"n_{key}"] = 0
+    return stats
+
+
+def _accumulate(inc, doc, sign):
+    """Add (sign=1) or remove (sign=-1) one patient's contribution to inc."""
+    inc["total"] += sign
+    if doc.get("stroke") == 1:
+        inc["stroke_yes"] += sign
+    elif doc.get("stroke") == 0:
+        inc["stroke_no"] += sign
+    if doc.get("gender") in GENDERS:
+        inc[f"genders.{doc['gender']}"] += sign
+    band = age_band_index(doc.get("age"))
+    if band is not None:
+        inc[f"age_bands.{band}"] += sign
+    if doc.get("risk_band") in RISK_BAND_NAMES:
+        inc[f"risk_bands.{doc['risk_band']}"] += sign
+    for key, field in AVERAGED_FIELDS.items():
+        value = doc.get(field)
+        if _is_num(value):
+            inc[f"sum_{key}"] += sign * value
+            inc[f"n_{key}"] += sign
+
+
+def refresh_high_risk():
+    """Re-read the top stroke patients by glucose into the stats document."""
+    top = (
+        mongo.db.patients.find({"stroke": 1}, HIGH_RISK_PROJECTION)
+        .sort([("avg_glucose_level", -1)])
+        .limit(HIGH_RISK_LIMIT)
+    )
+    _stats_coll().update_one(
+        {"_id": STATS_ID},
+        {"$set": {"high_risk": [high_risk_entry(d) for d in top]}},
+    )
+
+
+def apply_delta(removed=(), added=()):
+    """
+    Update the materialized statistics for removed and added patient
+    documents (an edit is one of each). Does nothing if the statistics
+    document does not exist yet; the next read rebuilds it.
+    """
+    inc = defaultdict(int)
+    for doc in removed:
+        _accumulate(inc, doc, -1)
+    for doc in added:
+        _accumulate(inc, doc, 1)
+    inc = {k: v for k, v in inc.items() if v}
+    # any change to a patient invalidates cached list and dashboard pages
+    inc["version"] = 1
+
+    # a stroke patient leaving may open a slot in the top list: re-read it
+    refresh = any(d.get("stroke") == 1 for d in removed)
+    update = {"$inc": inc}
+    newcomers = [high_risk_entry(d) for d in added if d.get("stroke") == 1]
+    if newcomers and not refresh:
+        update["$push"] = {"high_risk": {
+            "$each": newcomers,
+            "$sort": {"avg_glucose_level": -1},
+            "$slice": HIGH_RISK_LIMIT,
+        }}
+
+    try:
+        matched = _stats_coll().update_one({"_id": STATS_ID}, update).matched_count
+        if refresh and matched:
+            refresh_high_risk()
+    except PyMongoError:
+        log.warning("Could not update dashboard statistics", exc_info=True)
+
+
+def rebuild_stats():
+    """Recompute the statistics from the patients collection and store them."""
+    stats = compute_stats(mongo.db.patients)
+    _stats_coll().replace_one({"_id": STATS_ID}, _to_document(stats), upsert=True)
+    return stats
+
+
+def stats_drift(tolerance=1e-6):
+    """
+    Compare the stored statistics with a fresh computation.
+    Returns {field: (stored, actual)} for every value that differs.
+    """
+    doc = _stats_coll().find_one({"_id": STATS_ID})
+    stored = _from_document(doc) if doc else empty_stats()
+    actual = compute_stats(mongo.db.patients)
+
+    def flatten(stats):
+        nested = ("genders", "age_bands", "risk_bands", "high_risk")
+        flat = {k: v for k, v in stats.items() if k not in nested and k != "version"}
+        flat.update({f"risk_bands.{b}": n for b, n in stats["risk_bands"].items()})
+        flat.update({f"genders.{g}": n for g, n in stats["genders"].items()})
+        flat.update({f"age_bands.{i}": n for i, n in enumerate(stats["age_bands"])})
+        flat["high_risk"] = [e.get("patient_id") for e in stats["high_risk"]]
+        return flat
+
+    stored, actual = flatten(stored), flatten(actual)
+    drift = {}
+    for key in sorted(set(stored) | set(actual)):
+        a, b = stored.get(key, 0), actual.get(key, 0)
+        if _is_num(a) and _is_num(b):
+            if abs(a - b) > tolerance * max(1.0, abs(b)):
+                drift[key] = (a, b)
+        elif a != b:
+            drift[key] = (a, b)
+    return drift
+
+
+def load_stats():
+    """Read the materialized statistics, building them on first use."""
+    doc = _stats_coll().find_one({"_id": STATS_ID})
+    if doc is None:
+        return rebuild_stats()
+    return _from_document(doc)
+
+
+def stats_version():
+    """The statistics document's version, or None if it is missing or unreadable."""
+    try:
+        doc = _stats_coll().find_one({"_id": STATS_ID}, {"version": 1})
+    except PyMongoError:
+        return None
+    return doc.get("version") if doc else None
+
+
+def top_at_risk(limit=AT_RISK_LIMIT):
+    """Patients with the highest stored risk_score (an index-only read)."""
+    return list(
+        mongo.db.patients.find({"risk_score": {"$gte": 0}}, AT_RISK_PROJECTION)
+        .sort([("risk_score", -1)])
+        .limit(limit)
+    )
+
+
+# ---------- TEMPLATE CONTEXT ----------
+
+def _average(stats, key):
+    n = stats.get(f"n_{key}", 0)
+    if not n:
+        return None
+    return round(stats.get(f"sum_{key}", 0) / n, 1)
+
+
+def dashboard_context(stats):
+    """Turn raw statistics into the variables dashboard.html expects."""
+    total = stats["total"]
+    return {
+        "total": total,
+        "stroke_yes": stats["stroke_yes"],
+        "stroke_no": stats["stroke_no"],
+        "stroke_rate": round(stats["stroke_yes"] / total * 100, 1) if total else 0.0,
+        "genders": list(GENDERS),
+        "gender_counts": [stats["genders"].get(g, 0) for g in GENDERS],
+        "avg_age": _average(stats, "age"),
+        "avg_glucose": _average(stats, "glucose"),
+        "avg_bmi": _average(stats, "bmi"),
+        "age_bands": [label for label, _ in AGE_BANDS],
+        "age_band_counts": list(stats["age_bands"]),
+        "risk_bands": list(RISK_BAND_NAMES),
+        "risk_band_counts": [stats.get("risk_bands", {}).get(b, 0) for b in RISK_BAND_NAMES],
+        "high_risk": stats["high_risk"],
+        "at_risk": [],
+    }
+
+
+EMPTY_CONTEXT = {
+    "total": 0,
+    "stroke_yes": 0,
+    "stroke_no": 0,
+    "stroke_rate": 0.0,
+    "genders": [],
+    "gender_counts": [],
+    "avg_age": None,
+    "avg_glucose": None,
+    "avg_bmi": None,
+    "age_bands": [],
+    "age_band_counts": [],
+    "risk_bands": [],
+    "risk_band_counts": [],
+    "high_risk": [],
+    "at_risk": [],
+}
+
+
+def get_dashboard_context():
+    """Template context for every dashboard view; empty if MongoDB is down."""
+    try:
+        context = dashboard_context(load_stats())
+        context["at_risk"] = top_at_risk()
+        return context
+    except Exception:
+        return dict(EMPTY_CONTEXT)
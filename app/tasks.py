@@ -0,0 +1,107 @@
+"""
+Background job bodies for app.jobs. Each takes the Job as its first
+argument, reports progress through it and returns a JSON-serializable
+result.
+"""
+import os
+
+from flask import current_app
+
+from app import mongo
+from app.export import EXPORT_PROJECTION, csv_chunks, gzip_chunks, ndjson_chunks
+from app.importer import describe_failures, import_csv
+from app.patient_cache import invalidate_patient
+from app.risk import rescore_collection
+from app.stats import apply_delta, rebuild_stats
+
+EXPORT_ENCODERS = {"ndjson": ndjson_chunks, "csv": csv_chunks}
+
+
+def count_rows(csv_path):
+    """Number of data rows (lines after the header) in a CSV file."""
+    with open(csv_path, "rb") as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def import_task(job, csv_path, prune=False):
+    """Incremental CSV import (app.importer.import_csv)."""
+    total = count_rows(csv_path)
+    job.report(0, total)
+
+    def on_batch(removed, added):
+        for doc in removed:
+            invalidate_patient(doc["_id"])
+        apply_delta(removed=removed, added=added)
+
+    def on_progress(rows, summary):
+        job.report(rows, message=f"{summary['inserted']} new, {summary['updated']} changed")
+
+    summary = import_csv(
+        mongo.db.patients,
+        csv_path,
+        batch_size=current_app.config.get("IMPORT_BATCH_SIZE", 1000),
+        on_batch=on_batch,
+        prune=prune,
+        on_progress=on_progress,
+    )
+    job.report(total)
+    if summary["rejected"]:
+        summary["failures"] = describe_failures(summary)
+    return summary
+
+
+def export_task(job, fmt, query, path, compress=False):
+    """Write the patients matching query to path as ndjson or csv."""
+    job.report(0, mongo.db.patients.count_documents(query))
+    cursor = (
+        mongo.db.patients.find(query, EXPORT_PROJECTION)
+        .sort([("_id", 1)])
+        .batch_size(current_app.config.get("EXPORT_BATCH_SIZE", 1000))
+    )
+
+    def docs():
+        written = 0
+        for written, doc in enumerate(cursor, start=1):
+            yield doc
+            if written % 1000 == 0:
+                job.report(written)
+        job.report(written)
+
+    chunks = EXPORT_ENCODERS[fmt](docs())
+    # app.jobs deletes the file once the job record is dropped
+    job.files.append(path)
+    partial = path + ".part"
+    try:
+        if compress:
+            with open(partial, "wb") as f:
+                for data in gzip_chunks(chunks):
+                    f.write(data)
+        else:
+            with open(partial, "w", encoding="utf-8", newline="") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return {"rows": job.done, "bytes": os.path.getsize(path), "format": fmt, "gzip": compress}
+
+
+def rescore_task(job, batch_size=5000):
+    """Re-score stroke risk for every patient, then rebuild the statistics."""
+    job.report(0, mongo.db.patients.estimated_document_count())
+    updated = rescore_collection(
+        mongo.db.patients,
+        batch_size=batch_size,
+        on_progress=lambda scanned, updated: job.report(scanned),
+    )
+    stats = rebuild_stats()
+    job.report(stats["total"], stats["total"])
+    return {"updated": updated, "total": stats["total"]}
+
+
+def rebuild_stats_task(job):
+    """Recompute the materialized dashboard statistics."""
+    stats = rebuild_stats()
+    job.report(1, 1)
+    return {"total": stats["total"]}
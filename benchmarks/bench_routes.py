@@ -0,0 +1,290 @@
+"""
+Latency and round-trip benchmark for the patient routes.
+
+Seeds a MongoDB stand-in with N synthetic patients (benchmarks/synthetic.py),
+drives each route through the Flask test client and records p50/p95/p99
+latency plus the number of MongoDB round trips per request. Results are
+written as JSON so runs from different versions can be diffed.
+
+    python -m benchmarks.bench_routes --sizes 5000,100000,1000000
+    python -m benchmarks.bench_routes --backend mongomock --sizes 5000,100000
+
+The default backend, ``mongod``, uses MONGO_URI (default
+mongodb://localhost:27017/patient_app_bench) and drops that database
+first. ``mongomock`` (pip install mongomock) needs no server but is pure
+Python, so absolute numbers are only comparable between mongomock runs.
+It cannot run the import's upserts, so import_patients is skipped there.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from pymongo import MongoClient, monitoring
+
+from app import create_app, mongo
+from app.codec import CSV_HEADER
+from app.derived import add_derived_fields_batch
+from app.ingest import ingest_rows
+from app.indexes import ensure_indexes
+from app.jobs import SUCCEEDED, jobs
+from app.pagination import encode_cursor
+from app.stats import rebuild_stats
+from benchmarks.synthetic import generate_chunks, learn_marginals
+from config import Config
+
+DEFAULT_SIZES = (5_000, 100_000, 1_000_000)
+SEED_BATCH = 10_000
+
+
+class BenchConfig(Config):
+    TESTING = True
+    # record a failing route as a 500 instead of aborting the run
+    PROPAGATE_EXCEPTIONS = False
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    WTF_CSRF_ENABLED = False
+    MONGO_ENSURE_INDEXES = False
+    # the benchmark connects its own client (see connect)
+    MONGO_WARMUP = False
+    MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/patient_app_bench")
+
+
+# ---------- round-trip counting ----------
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts every command a real MongoClient sends (incl. getMore)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class _CountingCollection:
+    """mongomock has no command monitoring: count collection calls instead."""
+
+    def __init__(self, coll, counter):
+        self._coll = coll
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._coll, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._counter.count += 1
+            return attr(*args, **kwargs)
+        return call
+
+
+class _CountingDatabase:
+    def __init__(self, db, counter):
+        self._db = db
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return _CountingCollection(getattr(self._db, name), self._counter)
+
+    def __getitem__(self, name):
+        return _CountingCollection(self._db[name], self._counter)
+
+
+def connect(backend, uri):
+    """Point the app's `mongo` at the chosen backend; returns the counter."""
+    counter = CommandCounter()
+    if backend == "mongomock":
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed: pip install mongomock")
+        client = mongomock.MongoClient()
+        raw_db = client["patient_app_bench"]
+        mongo.cx, mongo.db = client, _CountingDatabase(raw_db, counter)
+    else:
+        client = MongoClient(uri, event_listeners=[counter])
+        raw_db = client.get_default_database()
+        client.drop_database(raw_db.name)
+        mongo.cx, mongo.db = client, raw_db
+    return raw_db, counter
+
+
+# ---------- seeding ----------
+
+def seed(raw_db, size, rng):
+    """Replace the patients with size synthetic ones (benchmarks/synthetic.py)."""
+    coll = raw_db.patients
+    coll.delete_many({})
+    model = learn_marginals()
+    for chunk in generate_chunks(model, size, seed=rng.randrange(2**32), chunk_rows=SEED_BATCH):
+        for parsed in ingest_rows([CSV_HEADER, *chunk], SEED_BATCH):
+            coll.insert_many(add_derived_fields_batch(parsed.docs), ordered=False)
+    ensure_indexes(raw_db)
+
+
+# ---------- measuring ----------
+
+def measure(client, counter, name, make_url, repeat, method="get"):
+    latencies, trips, statuses = [], [], {}
+    for i in range(repeat):
+        url = make_url(i)
+        before = counter.count
+        start = time.perf_counter()
+        resp = getattr(client, method)(url)
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed * 1000)
+        trips.append(counter.count - before)
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+    return summarize(name, latencies, trips, statuses)
+
+
+def measure_import(client, counter, repeat):
+    """
+    /patients/import only queues a background job (app/jobs.py), so each
+    request is timed until its import job has finished: the numbers cover
+    the import itself, and no import is still running when the next size
+    is seeded. Status codes are the jobs' final statuses; only succeeded
+    jobs count towards the latencies.
+    """
+    latencies, trips, statuses = [], [], {}
+    for _ in range(repeat):
+        known = {job.id for job in jobs.list()}
+        before = counter.count
+        start = time.perf_counter()
+        resp = client.get("/patients/import")
+        started = [job for job in jobs.list() if job.id not in known and job.kind == "import"]
+        if started:
+            started[0].future.result()
+            status = started[0].status
+        else:  # not submitted (conflict, full queue)
+            status = resp.status_code
+        elapsed = time.perf_counter() - start
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == SUCCEEDED:
+            latencies.append(elapsed * 1000)
+            trips.append(counter.count - before)
+    return summarize("patients.import_patients", latencies, trips, statuses)
+
+
+def summarize(name, latencies, trips, statuses):
+    """Percentiles of latencies (None when nothing was measured)."""
+    p50 = p95 = p99 = mean = round_trips = None
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).round(3).tolist()
+        mean = round(float(np.mean(latencies)), 3)
+        round_trips = round(float(np.mean(trips)), 2)
+    return {
+        "route": name,
+        "requests": len(latencies),
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "mean_ms": mean,
+        "round_trips": round_trips,
+        "status_codes": dict(sorted((str(k), v) for k, v in statuses.items())),
+    }
+
+
+def run_size(app, raw_db, counter, size, repeat, rng, include_import):
+    seed(raw_db, size, rng)
+    with app.app_context():
+        rebuild_stats()
+
+    ids = [d["_id"] for d in raw_db.patients.find({}, {"_id": 1}).sort("_id", 1)]
+    middle = encode_cursor(ids[len(ids) // 2])
+    sample = [str(rng.choice(ids)) for _ in range(repeat)]
+
+    client = app.test_client()
+    client.post("/auth/register", data={
+        "username": "bench", "email": "bench@example.com", "password": "benchpass",
+    })
+    client.post("/auth/login", data={"username": "bench", "password": "benchpass"})
+
+    routes = [
+        ("patients.list_patients", lambda i: "/patients/"),
+        ("patients.list_patients[deep]", lambda i: f"/patients/?after={middle}&page=2"),
+        ("patients.list_patients[search]", lambda i: "/patients/?q=smok"),
+        ("patients.list_patients[patient_id]", lambda i: f"/patients/?q={rng.randint(1, size)}"),
+        ("patients.patient_detail", lambda i: f"/patients/detail/{sample[i]}"),
+        ("patients.dashboard", lambda i: "/patients/dashboard"),
+        ("patients.analytics_summary", lambda i: "/patients/analytics?by=work_type"),
+    ]
+    results = [measure(client, counter, name, url, repeat) for name, url in routes]
+    if include_import:
+        # replaces the seeded data with the bundled CSV, so it runs last
+        results.append(measure_import(client, counter, max(1, repeat // 20)))
+    for r in results:
+        r["size"] = size
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongod")
+    parser.add_argument("--uri", default=BenchConfig.MONGO_URI)
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated cohort sizes")
+    parser.add_argument("--repeat", type=int, default=50, help="requests per route")
+    parser.add_argument("--no-import", action="store_true", help="skip import_patients")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    app = create_app(BenchConfig)
+    raw_db, counter = connect(args.backend, args.uri)
+    rng = random.Random(args.seed)
+    include_import = not args.no_import
+    if include_import and args.backend == "mongomock":
+        print("mongomock cannot run the import's upserts: skipping import_patients")
+        include_import = False
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"-- {size} patients", flush=True)
+        for r in run_size(app, raw_db, counter, size, args.repeat, rng, include_import):
+            if r["requests"]:
+                print(f"  {r['route']:40} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  "
+                      f"p99 {r['p99_ms']:9.2f} ms  trips {r['round_trips']:5}  {r['status_codes']}")
+            else:
+                print(f"  {r['route']:40} no successful requests  {r['status_codes']}")
+            results.append(r)
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
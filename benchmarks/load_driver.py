@@ -0,0 +1,255 @@
+"""
+Concurrent mixed-workload load driver.
+
+Seeds N synthetic patients, then replays a weighted mix of logins, list
+pages, searches, detail views, edits and dashboard hits from a growing
+number of threads against one ``create_app`` instance. Every thread has its
+own logged-in test client. For each concurrency level it reports throughput
+and p50/p95/p99 latency, overall and per operation, and marks the level
+where throughput stops scaling.
+
+    python -m benchmarks.load_driver --size 100000 --threads 1,2,4,8,16,32
+    python -m benchmarks.load_driver --mix list=50,detail=30,edit=20 --duration 20
+
+Requests run in-process, so the numbers include Flask, the drivers and the
+GIL but no HTTP server. The default backend is ``mongod`` (MONGO_URI).
+``mongomock`` is not thread-safe under writes, so ``--backend mongomock``
+is for smoke runs only and leaves the edits out of the mix.
+"""
+import argparse
+import json
+import platform
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app import create_app
+from app.pagination import encode_cursor
+from app.stats import rebuild_stats
+from benchmarks.bench_routes import BenchConfig, connect, git_revision, seed
+
+DEFAULT_MIX = "login=5,list=30,search=15,detail=30,edit=5,dashboard=15"
+DEFAULT_THREADS = "1,2,4,8,16"
+PASSWORD = "loadpass"
+SEARCH_TERMS = ["smok", "never", "formerly", "male", "female", "private", "self", "govt", "child"]
+# a level that adds less throughput than this over the previous one is saturated
+SCALING_THRESHOLD = 0.05
+
+
+def parse_mix(text):
+    """"list=30,detail=20" -> (["list", "detail"], [30.0, 20.0])"""
+    ops, weights = [], []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        ops.append(name)
+        weights.append(float(weight or 1))
+    return ops, weights
+
+
+# ---------- operations ----------
+# each takes (client, ctx, rng) and returns the response
+
+def op_login(client, ctx, rng):
+    return client.post("/auth/login", data={"username": ctx["username"], "password": PASSWORD})
+
+
+def op_list(client, ctx, rng):
+    if rng.random() < 0.5:
+        return client.get("/patients/")
+    return client.get(f"/patients/?after={rng.choice(ctx['cursors'])}&page=2")
+
+
+def op_search(client, ctx, rng):
+    return client.get(f"/patients/?q={rng.choice(SEARCH_TERMS)}")
+
+
+def op_detail(client, ctx, rng):
+    return client.get(f"/patients/detail/{rng.choice(ctx['ids'])}")
+
+
+def op_edit(client, ctx, rng):
+    doc = rng.choice(ctx["docs"])
+    form = {
+        field: doc[field]
+        for field in ("patient_id", "gender", "age", "hypertension", "heart_disease",
+                      "ever_married", "work_type", "residence_type", "smoking_status", "stroke")
+    }
+    form["avg_glucose_level"] = round(doc["avg_glucose_level"] * rng.uniform(0.9, 1.1), 2)
+    form["bmi"] = "" if doc.get("bmi") is None else doc["bmi"]
+    return client.post(f"/patients/edit/{doc['_id']}", data=form)
+
+
+def op_dashboard(client, ctx, rng):
+    return client.get("/patients/dashboard")
+
+
+OPERATIONS = {
+    "login": op_login,
+    "list": op_list,
+    "search": op_search,
+    "detail": op_detail,
+    "edit": op_edit,
+    "dashboard": op_dashboard,
+}
+
+
+# ---------- running ----------
+
+def _worker(app, ctx, ops, weights, seed_value, deadline, start, samples):
+    rng = random.Random(seed_value)
+    client = app.test_client()
+    op_login(client, ctx, rng)
+    start.wait()
+    while time.perf_counter() < deadline[0]:
+        name = rng.choices(ops, weights)[0]
+        began = time.perf_counter()
+        try:
+            status = OPERATIONS[name](client, ctx, rng).status_code
+        except Exception:
+            status = "exception"
+        samples.append((name, (time.perf_counter() - began) * 1000, status))
+
+
+def _failed(status):
+    return status == "exception" or status >= 500
+
+
+def _summary(latencies):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).round(2).tolist()
+    return {"requests": len(latencies), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+def run_level(app, ctx, ops, weights, threads, duration, seed_value):
+    """Run the mix from `threads` threads for `duration` seconds."""
+    samples = []  # list.append is atomic, so the threads share it
+    start = threading.Barrier(threads + 1)
+    deadline = [float("inf")]
+    workers = [
+        threading.Thread(
+            target=_worker,
+            args=(app, ctx, ops, weights, seed_value + i, deadline, start, samples),
+            daemon=True,
+        )
+        for i in range(threads)
+    ]
+    for w in workers:
+        w.start()
+    start.wait()
+    began = time.perf_counter()
+    deadline[0] = began + duration
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - began
+
+    if not samples:
+        return {"threads": threads, "requests": 0, "throughput_rps": 0.0}
+    errors = sum(1 for _, _, s in samples if _failed(s))
+    result = {
+        "threads": threads,
+        "throughput_rps": round(len(samples) / elapsed, 2),
+        "errors": errors,
+        **_summary([ms for _, ms, _ in samples]),
+        "operations": {},
+    }
+    for name in ops:
+        mine = [(ms, s) for op, ms, s in samples if op == name]
+        if mine:
+            result["operations"][name] = {
+                **_summary([ms for ms, _ in mine]),
+                "errors": sum(1 for _, s in mine if _failed(s)),
+            }
+    return result
+
+
+def mark_saturation(levels):
+    """Flag the first level that scales throughput by less than SCALING_THRESHOLD."""
+    for prev, level in zip(levels, levels[1:]):
+        if level["throughput_rps"] < prev["throughput_rps"] * (1 + SCALING_THRESHOLD):
+            level["saturated"] = True
+            return level["threads"]
+    return None
+
+
+def prepare(app, raw_db, size, rng, sample_size=500):
+    seed(raw_db, size, rng)
+    with app.app_context():
+        rebuild_stats()
+
+    client = app.test_client()
+    username = "load"
+    # the first registered user becomes admin, which the edits need
+    client.post("/auth/register", data={
+        "username": username, "email": "load@example.com", "password": PASSWORD,
+    })
+
+    ids = [d["_id"] for d in raw_db.patients.find({}, {"_id": 1}).sort("_id", 1)]
+    picked = rng.sample(ids, min(sample_size, len(ids)))
+    docs = list(raw_db.patients.find({"_id": {"$in": picked}}))
+    return {
+        "username": username,
+        "ids": [str(oid) for oid in picked],
+        "docs": docs,
+        "cursors": [encode_cursor(ids[rng.randrange(len(ids))]) for _ in range(50)],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongod")
+    parser.add_argument("--uri", default=BenchConfig.MONGO_URI)
+    parser.add_argument("--size", type=int, default=5000, help="synthetic patients to seed")
+    parser.add_argument("--threads", default=DEFAULT_THREADS, help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight,...")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="load_results.json")
+    args = parser.parse_args(argv)
+
+    ops, weights = parse_mix(args.mix)
+    if args.backend == "mongomock" and "edit" in ops:
+        print("mongomock is not thread-safe under writes: leaving edits out of the mix")
+        weights = [w for op, w in zip(ops, weights) if op != "edit"]
+        ops = [op for op in ops if op != "edit"]
+        if not ops:
+            raise SystemExit("nothing left in the mix")
+    app = create_app(BenchConfig)
+    raw_db, _ = connect(args.backend, args.uri)
+    rng = random.Random(args.seed)
+    ctx = prepare(app, raw_db, args.size, rng)
+
+    levels = []
+    for threads in (int(t) for t in args.threads.split(",")):
+        level = run_level(app, ctx, ops, weights, threads, args.duration, args.seed)
+        levels.append(level)
+        print(f"  {threads:3} threads  {level['throughput_rps']:9.1f} req/s  "
+              f"p50 {level.get('p50_ms', 0):8.2f} ms  p95 {level.get('p95_ms', 0):8.2f} ms  "
+              f"p99 {level.get('p99_ms', 0):8.2f} ms  errors {level.get('errors', 0)}", flush=True)
+    saturated = mark_saturation(levels)
+    if saturated:
+        print(f"Throughput stops scaling at {saturated} threads")
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "size": args.size,
+            "duration_s": args.duration,
+            "mix": dict(zip(ops, weights)),
+            "saturated_at": saturated,
+        },
+        "levels": levels,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
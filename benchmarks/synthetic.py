@@ -0,0 +1,112 @@
+"""
+Synthetic cohort generator.
+
+Learns the marginal distribution of every column of the bundled stroke
+dataset and writes arbitrarily large CSVs with the same header and value
+formats, so they can go through /patients/import or the benchmarks.
+
+    python -m benchmarks.synthetic --rows 1000000 --out patients_1m.csv
+
+Categorical and 0/1 columns keep their observed frequencies. Numeric
+columns are resampled from the observed values: age exactly (it is mostly
+whole years, with fractions for infants), glucose and bmi with a small
+Gaussian jitter clipped to the observed range. The bmi "N/A" rate is kept.
+Columns are sampled independently.
+"""
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from app.codec import CSV_HEADER
+
+SOURCE_CSV = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "app", "healthcare-dataset-stroke-data.csv",
+)
+
+CATEGORICAL = ["gender", "ever_married", "work_type", "Residence_type", "smoking_status",
+               "hypertension", "heart_disease", "stroke"]
+# column -> (jitter as a fraction of the std dev, decimals)
+NUMERIC = {"age": (0.0, 2), "avg_glucose_level": (0.05, 2), "bmi": (0.05, 1)}
+
+CHUNK_ROWS = 100_000
+
+
+def learn_marginals(path=SOURCE_CSV):
+    """Per-column distributions of a stroke-dataset CSV."""
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+
+    model = {"categorical": {}, "numeric": {}, "na_rate": {}}
+    for col in CATEGORICAL:
+        values, counts = np.unique([r[col] for r in rows], return_counts=True)
+        model["categorical"][col] = (values.tolist(), (counts / counts.sum()).tolist())
+    for col in NUMERIC:
+        raw = [r[col] for r in rows]
+        present = np.array([float(v) for v in raw if v not in ("", "N/A")])
+        model["numeric"][col] = present
+        model["na_rate"][col] = 1 - len(present) / len(raw)
+    return model
+
+
+def _numeric_column(model, col, n, rng):
+    observed = model["numeric"][col]
+    jitter, decimals = NUMERIC[col]
+    values = rng.choice(observed, size=n)
+    if jitter:
+        values = values + rng.normal(0, jitter * observed.std(), size=n)
+        values = np.clip(values, observed.min(), observed.max())
+    text = np.char.mod(f"%.{decimals}f", values.round(decimals))
+    if col == "age":
+        # whole ages are written without decimals, as in the source file
+        whole = values == np.floor(values)
+        text[whole] = values[whole].astype(int).astype(str)
+    na = rng.random(n) < model["na_rate"][col]
+    text[na] = "N/A"
+    return text
+
+
+def generate_chunks(model, n, seed=None, start_id=1, chunk_rows=CHUNK_ROWS):
+    """Yield lists of CSV rows (lists of strings), chunk_rows at a time."""
+    rng = np.random.default_rng(seed)
+    next_id = start_id
+    remaining = n
+    while remaining > 0:
+        size = min(chunk_rows, remaining)
+        columns = {"id": np.arange(next_id, next_id + size).astype(str)}
+        for col, (values, probs) in model["categorical"].items():
+            columns[col] = rng.choice(np.asarray(values), size=size, p=probs)
+        for col in NUMERIC:
+            columns[col] = _numeric_column(model, col, size, rng)
+        yield np.column_stack([columns[h] for h in CSV_HEADER]).tolist()
+        next_id += size
+        remaining -= size
+
+
+def write_csv(path, n, model=None, seed=None):
+    """Write n synthetic patients to path; returns path."""
+    model = model or learn_marginals()
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for chunk in generate_chunks(model, n, seed=seed):
+            writer.writerows(chunk)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic stroke-dataset CSV.")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--source", default=SOURCE_CSV, help="CSV to learn the distributions from")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    write_csv(args.out, args.rows, learn_marginals(args.source), seed=args.seed)
+    print(f"Wrote {args.rows} patients to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,5 +13,58 @@ class Config:
         "mongodb://localhost:27017/patient_app"
     )
 
+    # MongoDB client: fail fast instead of pymongo's 30s server selection wait
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 2000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 2000))
+    MONGO_HEARTBEAT_MS = int(os.environ.get("MONGO_HEARTBEAT_MS", 2000))
+    MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+    # ping MongoDB when the app starts
+    MONGO_WARMUP = os.environ.get("MONGO_WARMUP", "1") == "1"
+    # failed heartbeats before requests stop waiting for MongoDB, and
+    # seconds between trial requests while it stays unreachable
+    MONGO_BREAKER_THRESHOLD = int(os.environ.get("MONGO_BREAKER_THRESHOLD", 3))
+    MONGO_BREAKER_RESET = float(os.environ.get("MONGO_BREAKER_RESET", 30))
+
+    # create the MongoDB indexes from app/indexes.py when the app starts
+    MONGO_ENSURE_INDEXES = os.environ.get("MONGO_ENSURE_INDEXES", "1") == "1"
+
+    # in-process cache of logged-in users (see app/models.py:load_user)
+    USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 1024))
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 300))
+
+    # in-process cache of patient documents (see app/patient_cache.py)
+    PATIENT_CACHE_SIZE = int(os.environ.get("PATIENT_CACHE_SIZE", 2048))
+    PATIENT_CACHE_TTL = float(os.environ.get("PATIENT_CACHE_TTL", 60))
+
+    # rows per insert_many batch when importing the CSV dataset
+    IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 1000))
+
+    # largest JSON array accepted by POST /patients/bulk
+    BULK_MAX_OPERATIONS = int(os.environ.get("BULK_MAX_OPERATIONS", 1000))
+
+    # cursor batch size for /patients/export
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+
+    # background jobs: how many run at once, and how many more may wait
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+    JOB_QUEUE_LIMIT = int(os.environ.get("JOB_QUEUE_LIMIT", 8))
+
+    # where export jobs write their files (default: <instance>/exports)
+    EXPORT_DIR = os.environ.get("EXPORT_DIR")
+
+    # MongoDB commands slower than this are logged with their explain() plan
+    SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+    SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "1") == "1"
+
+    # seconds before the in-memory analytics snapshot is refreshed
+    SNAPSHOT_MAX_AGE = float(os.environ.get("SNAPSHOT_MAX_AGE", 30))
+
+    # /patients/analytics/histogram: default and largest bin count, and
+    # how many (field, split, bins, filters) results are cached
+    HISTOGRAM_BINS = int(os.environ.get("HISTOGRAM_BINS", 20))
+    HISTOGRAM_MAX_BINS = int(os.environ.get("HISTOGRAM_MAX_BINS", 100))
+    HISTOGRAM_CACHE_SIZE = int(os.environ.get("HISTOGRAM_CACHE_SIZE", 256))
+
     # CSRF should be enabled in production / for your assignment
     WTF_CSRF_ENABLED = True
@@ -1,6 +1,8 @@
-from flask import render_template
+from flask import make_response, render_template
 from flask_login import login_required
-from app import create_app, mongo   # <- mongo comes from app/__init__.py
+from app import create_app
+from app.conditional import cacheable, not_modified, page_etag
+from app.stats import get_dashboard_context, stats_version
 
 app = create_app()
 
@@ -11,29 +13,13 @@ app = create_app()
 def dashboard():
     """
     Analytics dashboard at /dashboard.
-    Uses MongoDB 'patients' collection.
+    Uses the shared dashboard statistics engine (app/stats.py).
     """
-    try:
-        coll = mongo.db.patients
-        total = coll.count_documents({})
-        stroke_yes = coll.count_documents({"stroke": 1})
-        stroke_no = coll.count_documents({"stroke": 0})
-
-        genders = ["Male", "Female", "Other"]
-        gender_counts = [coll.count_documents({"gender": g}) for g in genders]
-    except Exception:
-        total = stroke_yes = stroke_no = 0
-        genders = []
-        gender_counts = []
-
-    return render_template(
-        "dashboard.html",
-        total=total,
-        stroke_yes=stroke_yes,
-        stroke_no=stroke_no,
-        genders=genders,
-        gender_counts=gender_counts,
-    )
+    etag = page_etag(stats_version())
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    return cacheable(make_response(render_template("dashboard.html", **get_dashboard_context())), etag)
 # -------------------------------------
 
 